@@ -0,0 +1,248 @@
+"""
+Модуль ограничивает частоту запросов к формам и число одновременных
+вычислений хешей паролей. При превышении сразу отвечает 429.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, request
+from flask_login import current_user
+from werkzeug.exceptions import TooManyRequests
+
+from logger import logger
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+TOO_MANY_REQUESTS = 'Слишком много запросов, повторите позже.'
+# Как часто из SQLiteStore удаляются полные корзины, в секундах.
+PRUNE_INTERVAL = 60
+
+
+def parse_limit(limit: str) -> tuple[float, float]:
+    """
+    Разбор ограничения вида '5/minute'.
+
+    Args:
+        limit (str): количество запросов и период через '/'.
+
+    Returns:
+        rate: скорость пополнения корзины, запросов в секунду.
+        capacity: емкость корзины.
+    """
+    count, period = limit.split('/')
+    return int(count) / PERIODS[period], int(count)
+
+
+class MemoryStore:
+    """
+    Хранилище корзин токенов в памяти процесса.
+    Хранится не больше max_keys корзин: ключи берутся из формы,
+    поэтому при переполнении удаляется дольше всех не использованная.
+    """
+
+    def __init__(self, max_keys: int = 10000) -> None:
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self._max_keys = max_keys
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        """
+        Попытка взять токен из корзины.
+
+        Args:
+            key (str): ключ корзины.
+            rate (float): скорость пополнения, токенов в секунду.
+            capacity (float): емкость корзины.
+
+        Returns:
+            float: 0, если токен взят, иначе через сколько секунд
+                   появится следующий токен.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class SQLiteStore:
+    """
+    Хранилище корзин токенов в файле SQLite,
+    общее для нескольких процессов-воркеров.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._local = threading.local()
+        self._pruned = 0
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            columns = [row[1] for row in connection.execute(
+                'PRAGMA table_info(buckets)')]
+            if columns and 'full_at' not in columns:
+                # Корзины старого формата без времени заполнения.
+                connection.execute('DROP TABLE buckets')
+            # full_at - когда корзина снова станет полной,
+            # после этого строку можно удалить.
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL, updated REAL, '
+                'full_at REAL)')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS ix_buckets_full_at '
+                'ON buckets (full_at)')
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Соединение с файлом хранилища, отдельное для каждого потока.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        """
+        Попытка взять токен из корзины, см. MemoryStore.take.
+        """
+        now = time.time()
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT tokens, updated FROM buckets WHERE key = ?',
+                (key,)).fetchone()
+            tokens, updated = row or (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            connection.execute(
+                'INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)',
+                (key, tokens, now, now + (capacity - tokens) / rate))
+            if now - self._pruned >= PRUNE_INTERVAL:
+                self._pruned = now
+                connection.execute(
+                    'DELETE FROM buckets WHERE full_at <= ?', (now,))
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+
+def get_store() -> MemoryStore | SQLiteStore:
+    """
+    Хранилище корзин, заданное в RATE_LIMIT_STORE:
+    'memory' или 'sqlite:///путь/к/файлу'.
+    """
+    store = current_app.extensions.get('rate_limit_store')
+    if store is None:
+        uri = current_app.config.get('RATE_LIMIT_STORE', 'memory')
+        if uri.startswith('sqlite:///'):
+            store = SQLiteStore(uri.removeprefix('sqlite:///'))
+        else:
+            store = MemoryStore()
+        current_app.extensions['rate_limit_store'] = store
+    return store
+
+
+def client_ip() -> str:
+    """
+    Ключ ограничения по IP-адресу клиента.
+    """
+    return f'ip:{request.remote_addr}'
+
+
+def form_user() -> str | None:
+    """
+    Ключ ограничения по имени и фамилии, введенным в форму.
+    """
+    name = request.form.get('name', '').strip().lower()
+    surname = request.form.get('surname', '').strip().lower()
+    if not (name or surname):
+        return None
+    return f'user:{name} {surname}'
+
+
+def logged_user() -> str | None:
+    """
+    Ключ ограничения по авторизованному пользователю.
+    """
+    if not current_user.is_authenticated:
+        return None
+    return f'user:{current_user.get_id()}'
+
+
+def rate_limit(limit: str, key=client_ip, methods=('POST',)):
+    """
+    Декоратор ограничения частоты запросов к обработчику
+    по алгоритму корзины токенов.
+
+    Args:
+        limit (str): ограничение вида '5/minute'.
+        key: функция, возвращающая ключ клиента или None.
+        methods: HTTP-методы, к которым применяется ограничение.
+    """
+    rate, capacity = parse_limit(limit)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            client = key() if request.method in methods else None
+            if client is not None:
+                wait = get_store().take(
+                    f'{request.endpoint}:{client}', rate, capacity)
+                if wait:
+                    logger.warning(
+                        f'Превышен лимит {limit} для {client} '
+                        f'на {request.endpoint}')
+                    raise TooManyRequests(
+                        TOO_MANY_REQUESTS, retry_after=int(wait) + 1)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ConcurrencyLimiter:
+    """
+    Ограничение числа одновременных тяжелых вычислений в процессе.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._semaphore = None
+
+    @contextmanager
+    def slot(self):
+        """
+        Занятие места на время вычисления. Если свободного места нет,
+        запрос сразу отклоняется с 429. PASSWORD_HASHING_TIMEOUT
+        позволяет подождать место заданное число секунд.
+        """
+        with self._lock:
+            if self._semaphore is None:
+                self._semaphore = threading.BoundedSemaphore(
+                    current_app.config.get('PASSWORD_HASHING_CONCURRENCY', 4))
+        timeout = current_app.config.get('PASSWORD_HASHING_TIMEOUT', 0)
+        if not self._semaphore.acquire(timeout=timeout):
+            logger.warning('Нет свободных мест для вычисления хеша пароля')
+            raise TooManyRequests(TOO_MANY_REQUESTS, retry_after=1)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+password_hashing = ConcurrencyLimiter()
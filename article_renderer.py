@@ -0,0 +1,54 @@
+"""
+Модуль преобразует текст статьи из markdown в безопасный HTML,
+собирает оглавление и делит статью на разделы для ленивой загрузки.
+"""
+import re
+
+import bleach
+import markdown
+from markdown.extensions.toc import slugify_unicode
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'dd', 'div', 'dl', 'dt',
+    'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol',
+    'p', 'pre', 'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td',
+    'th', 'thead', 'tr', 'u', 'ul',
+    }
+ALLOWED_ATTRIBUTES = {
+    '*': ['class', 'id', 'title'],
+    'a': ['href', 'title'],
+    'img': ['src', 'alt', 'title', 'width', 'height'],
+    'td': ['colspan', 'rowspan'],
+    'th': ['colspan', 'rowspan'],
+    }
+
+# Разделы статьи начинаются с заголовков второго уровня.
+SECTION_START = re.compile(r'(?=<h2[\s>])')
+
+
+def render_article(content: str) -> tuple[str, list]:
+    """
+    Преобразование текста статьи в HTML.
+
+    Args:
+        content (str): текст статьи в markdown (допускается HTML).
+
+    Returns:
+        toc: HTML-код оглавления.
+        sections: список HTML-кодов разделов статьи.
+    """
+    md = markdown.Markdown(
+        extensions=['extra', 'toc'],
+        extension_configs={'toc': {'slugify': slugify_unicode}},
+        )
+    html = bleach.clean(
+        md.convert(content or ''),
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        strip=True,
+        )
+    toc = bleach.clean(
+        md.toc, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+    sections = [section for section in SECTION_START.split(html)
+                if section.strip()]
+    return toc, sections or ['']
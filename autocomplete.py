@@ -0,0 +1,349 @@
+"""
+Модуль содержит префиксные индексы для автодополнения полей формы
+сведений о ремонте: поездов, исполнителей и неисправностей.
+Индексы строятся вне блокировки поиска, устаревшие индексы
+перестраиваются в фоновом потоке, а до замены подсказки выдаются
+по старым.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Callable, Iterable
+
+from logger import logger
+
+# Количество подсказок в ответе.
+LIMIT = 10
+# Сколько ключей, добавленных после построения индекса, может
+# просматриваться перебором. При большем числе индекс перестраивается.
+PENDING_LIMIT = 1000
+
+
+def normalize(value: str) -> str:
+    """
+    Приведение строки к виду для сравнения.
+    """
+    return ' '.join(value.lower().replace('ё', 'е').split())
+
+
+class PrefixIndex:
+    """
+    Отсортированный список ключей для поиска по префиксу.
+    Ключами значения служат оно само и каждое его слово,
+    подсказки ранжируются по частоте использования значения.
+    Над списком ключей строится дерево отрезков с лучшим рангом
+    на каждом отрезке, поэтому лучшие подсказки находятся
+    за O(limit * log n) даже для префикса, под который попадает
+    большая часть значений. Новые значения не перестраивают дерево:
+    их ключи хранятся в отдельном небольшом списке и просматриваются
+    при поиске, в дерево они попадают при следующем построении.
+    """
+
+    def __init__(self) -> None:
+        self._keys = []
+        self._weights = {}
+        self._tree = []
+        self._size = 0
+        self._pending = []
+
+    def add(self, value: str, weight: int = 0) -> None:
+        """
+        Добавление значения или увеличение его веса.
+
+        Args:
+            value (str): значение поля.
+            weight (int): на сколько увеличить вес значения.
+        """
+        if not value or not value.strip():
+            return
+        value = value.strip()
+        if value in self._weights:
+            self._weights[value] += weight
+            self._update(value)
+            return
+        self._weights[value] = weight
+        for key in self._value_keys(value):
+            insort(self._pending, key)
+
+    @property
+    def pending(self) -> int:
+        """
+        Число ключей, добавленных после построения дерева.
+        """
+        return len(self._pending)
+
+    def extend(self, values: Iterable) -> None:
+        """
+        Добавление множества значений и построение дерева
+        с одной сортировкой ключей.
+
+        Args:
+            values: пары (значение, вес).
+        """
+        for value, weight in values:
+            if not value or not value.strip():
+                continue
+            value = value.strip()
+            if value in self._weights:
+                self._weights[value] += weight
+                continue
+            self._weights[value] = weight
+            self._keys.extend(self._value_keys(value))
+        self._keys.extend(self._pending)
+        self._pending = []
+        self._keys.sort()
+        self._build()
+
+    def bump(self, value: str) -> None:
+        """
+        Увеличение веса значения, если оно есть в индексе.
+        """
+        if value and value.strip() in self._weights:
+            value = value.strip()
+            self._weights[value] += 1
+            self._update(value)
+
+    @staticmethod
+    def _value_keys(value: str) -> list:
+        words = normalize(value).split(' ')
+        return [(' '.join(words[number:]), value)
+                for number in range(len(words))]
+
+    def _rank(self, value: str) -> tuple:
+        return -self._weights[value], len(value), value
+
+    def _build(self) -> None:
+        """
+        Построение дерева отрезков по текущему списку ключей.
+        """
+        self._size = 1
+        while self._size < len(self._keys):
+            self._size *= 2
+        tree = [None] * (2 * self._size)
+        for position, (_, value) in enumerate(self._keys):
+            tree[self._size + position] = self._rank(value)
+        for node in range(self._size - 1, 0, -1):
+            children = [rank for rank in tree[2 * node:2 * node + 2] if rank]
+            tree[node] = min(children) if children else None
+        self._tree = tree
+
+    def _update(self, value: str) -> None:
+        """
+        Обновление ранга значения в дереве после изменения веса.
+        Ранг значения из списка новых ключей считается при поиске.
+        """
+        rank = self._rank(value)
+        for key in self._value_keys(value):
+            position = bisect_left(self._keys, key)
+            if position == len(self._keys) or self._keys[position] != key:
+                return
+            node = self._size + position
+            self._tree[node] = rank
+            node //= 2
+            while node:
+                children = [child for child
+                            in self._tree[2 * node:2 * node + 2] if child]
+                self._tree[node] = min(children)
+                node //= 2
+
+    def search(self, prefix: str, limit: int = LIMIT) -> list:
+        """
+        Поиск значений по префиксу.
+
+        Args:
+            prefix (str): начало значения или любого его слова.
+            limit (int): количество подсказок.
+
+        Returns:
+            list: значения по убыванию веса, затем по длине и алфавиту.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        suggestions = self._search_tree(prefix, limit)
+        low = bisect_left(self._pending, (prefix,))
+        high = bisect_left(self._pending, (prefix + '\uffff',))
+        added = {value for _, value in self._pending[low:high]}
+        if added:
+            suggestions = sorted(
+                added.union(suggestions), key=self._rank)[:limit]
+        return suggestions
+
+    def _search_tree(self, prefix: str, limit: int) -> list:
+        """
+        Поиск значений по префиксу в дереве отрезков.
+        """
+        low = bisect_left(self._keys, (prefix,))
+        high = bisect_left(self._keys, (prefix + '\uffff',))
+        # Узлы дерева, вместе покрывающие отрезок ключей [low, high).
+        heap = []
+        left, right = low + self._size, high + self._size
+        while left < right:
+            if left % 2:
+                heap.append((self._tree[left], left))
+                left += 1
+            if right % 2:
+                right -= 1
+                heap.append((self._tree[right], right))
+            left //= 2
+            right //= 2
+        heapq.heapify(heap)
+        suggestions = []
+        while heap and len(suggestions) < limit:
+            rank, node = heapq.heappop(heap)
+            if node >= self._size:
+                if rank[2] not in suggestions:
+                    suggestions.append(rank[2])
+                continue
+            for child in (2 * node, 2 * node + 1):
+                if self._tree[child]:
+                    heapq.heappush(heap, (self._tree[child], child))
+        return suggestions
+
+
+def run_in_background(function: Callable[[], None]) -> None:
+    """
+    Запуск функции в фоновом потоке.
+    """
+    threading.Thread(target=function, daemon=True).start()
+
+
+class Autocomplete:
+    """
+    Набор префиксных индексов по полям формы.
+    Первое построение выполняется в вызвавшем потоке, следующие -
+    в фоновом. Значения, добавленные во время построения,
+    повторяются на новых индексах перед их заменой.
+    """
+
+    FIELDS = ('train', 'executer', 'defect', 's_def')
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._indexes = {field: PrefixIndex() for field in self.FIELDS}
+        self._loaded_at = None
+        self._ready = False
+        self._version = 0
+        # Изменения индексов во время построения новых.
+        self._journal = None
+
+    def ensure_loaded(self, loader: Callable[[], Iterable],
+                      ttl: float) -> None:
+        """
+        Построение индексов, если они не построены или устарели.
+
+        Args:
+            loader: функция, возвращающая тройки (поле, значение, вес).
+            ttl (float): время жизни индексов в секундах.
+        """
+        if not self._expired(ttl):
+            return
+        if not self._ready:
+            self._reload(loader, ttl)
+        elif not self._build_lock.locked():
+            run_in_background(lambda: self._reload(loader, ttl, False))
+
+    def _reload(self, loader: Callable[[], Iterable], ttl: float,
+                wait: bool = True) -> None:
+        """
+        Построение новых индексов и их замена.
+
+        Args:
+            loader: функция, возвращающая тройки (поле, значение, вес).
+            ttl (float): время жизни индексов в секундах.
+            wait (bool): ждать построения, начатого другим потоком.
+        """
+        if not self._build_lock.acquire(blocking=wait):
+            return
+        try:
+            if not self._expired(ttl):
+                return
+            with self._lock:
+                version = self._version
+                self._journal = []
+            values = {field: [] for field in self.FIELDS}
+            for field, value, weight in loader():
+                values[field].append((value, weight))
+            indexes = {field: PrefixIndex() for field in self.FIELDS}
+            for field, index in indexes.items():
+                index.extend(values[field])
+            with self._lock:
+                for method, field, args in self._journal:
+                    getattr(indexes[field], method)(*args)
+                self._indexes = indexes
+                self._ready = True
+                # Сброс во время построения требует еще одного.
+                if version == self._version:
+                    self._loaded_at = time.monotonic()
+        except Exception:
+            if not wait:
+                logger.exception('Ошибка построения индексов подсказок')
+                return
+            raise
+        finally:
+            with self._lock:
+                self._journal = None
+            self._build_lock.release()
+
+    def _expired(self, ttl: float) -> bool:
+        return (self._loaded_at is None
+                or time.monotonic() - self._loaded_at >= ttl
+                or any(index.pending > PENDING_LIMIT
+                       for index in self._indexes.values()))
+
+    def invalidate(self) -> None:
+        """
+        Сброс индексов, они будут перестроены при следующем обращении.
+        """
+        with self._lock:
+            self._version += 1
+            self._loaded_at = None
+
+    def _apply(self, method: str, field: str, *args) -> None:
+        """
+        Изменение индекса поля и запись изменения для строящихся индексов.
+        """
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((method, field, args))
+            getattr(self._indexes[field], method)(*args)
+
+    def add(self, field: str, value: str, weight: int = 0) -> None:
+        """
+        Добавление значения в индекс поля.
+
+        Args:
+            field (str): поле формы.
+            value (str): значение.
+            weight (int): на сколько увеличить вес значения.
+        """
+        self._apply('add', field, value, weight)
+
+    def bump(self, field: str, value: str) -> None:
+        """
+        Увеличение веса значения поля после его использования.
+
+        Args:
+            field (str): поле формы.
+            value (str): значение.
+        """
+        self._apply('bump', field, value)
+
+    def search(self, field: str, prefix: str) -> list:
+        """
+        Подсказки для поля по введенному началу значения.
+
+        Args:
+            field (str): поле формы.
+            prefix (str): введенный текст.
+
+        Returns:
+            list: подсказки.
+        """
+        with self._lock:
+            return self._indexes[field].search(prefix)
+
+
+autocomplete = Autocomplete()
@@ -0,0 +1,346 @@
+"""
+Модуль ведет журнал изменений (change data capture) таблиц
+Train, Defects, Articles, Users и Repair_information.
+Каждая вставка, изменение и удаление записывается в таблицу change_log
+в той же транзакции, номер записи журнала растет монотонно.
+Подписчики (кэши и индексы) читают журнал от своего смещения
+вместо повторного чтения таблиц.
+"""
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Callable
+
+import click
+from sqlalchemy import delete, event, func, or_, select
+from sqlalchemy.orm import Session
+
+from logger import logger
+from main import app, db
+
+# Таблицы, изменения которых попадают в журнал.
+TRACKED_TABLES = {
+    'train', 'defects', 'articles', 'users', 'repair_information',
+    }
+# Сколько секунд ждать пропущенный номер журнала. Номера выдаются при
+# вставке, а видны после фиксации транзакции, поэтому более поздний
+# номер может появиться раньше. Пропуск старше этого времени считается
+# номером отмененной транзакции.
+GAP_TIMEOUT = 10
+# Сколько секунд перечитываются пропущенные номера. Время записи журнала
+# ставится при сохранении, а не при фиксации, поэтому записи длинной
+# транзакции (например, загрузки каталога) появляются позже пропуска.
+GAP_RESCAN = 3600
+# Сколько записей журнала читается за один раз.
+READ_LIMIT = 1000
+
+INSERT, UPDATE, DELETE = 'I', 'U', 'D'
+
+
+class Change_log(db.Model):
+    """
+    Табличка 'Журнал изменений'. Пустой row_id означает
+    массовое изменение таблицы (например, при загрузке каталога).
+    """
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'),
+                   primary_key=True)
+    table_name = db.Column(db.String(32))
+    row_id = db.Column(db.Integer, nullable=True)
+    operation = db.Column(db.String(1))
+    created = db.Column(db.DateTime, default=datetime.now)
+
+    # Номера не должны повторяться и после очистки журнала.
+    __table_args__ = (
+        db.Index('ix_change_log_table_name_id', 'table_name', 'id'),
+        {'sqlite_autoincrement': True},
+        )
+
+
+def write_changes(session: Session, changes: list) -> None:
+    """
+    Запись изменений в журнал в текущей транзакции сессии.
+
+    Args:
+        session (Session): сессия, в которой произошли изменения.
+        changes (list): словари с полями table_name, row_id и operation.
+    """
+    if not changes:
+        return
+    statement = Change_log.__table__.insert()
+    created = datetime.now()
+    session.connection(bind_arguments={'clause': statement}).execute(
+        statement, [{**change, 'created': created} for change in changes])
+
+
+@event.listens_for(db.session, 'after_flush')
+def capture_changes(session, flush_context) -> None:
+    """
+    Запись в журнал объектов, сохраненных через ORM.
+    """
+    changes = []
+    for objects, operation in ((session.new, INSERT),
+                               (session.dirty, UPDATE),
+                               (session.deleted, DELETE)):
+        for obj in objects:
+            table_name = getattr(obj, '__tablename__', None)
+            if table_name not in TRACKED_TABLES:
+                continue
+            if operation == UPDATE and not session.is_modified(obj):
+                continue
+            changes.append({
+                'table_name': table_name,
+                'row_id': obj.id,
+                'operation': operation,
+                })
+    write_changes(session, changes)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def capture_bulk_changes(orm_execute_state) -> None:
+    """
+    Запись в журнал массовых insert/update/delete, выполненных
+    через session.execute в обход объектов ORM.
+    """
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    table_name = mapper.local_table.name if mapper is not None else None
+    if table_name not in TRACKED_TABLES:
+        return
+    if orm_execute_state.is_insert:
+        operation = INSERT
+    elif orm_execute_state.is_delete:
+        operation = DELETE
+    else:
+        operation = UPDATE
+    write_changes(orm_execute_state.session, [{
+        'table_name': table_name, 'row_id': None, 'operation': operation,
+        }])
+
+
+class Subscriber:
+    """
+    Подписчик журнала со своим смещением.
+    """
+
+    def __init__(self, name: str, callback: Callable[[list], None],
+                 tables: set) -> None:
+        self.name = name
+        self.callback = callback
+        self.tables = tables
+        self.offset = None
+
+
+class ChangeFeed:
+    """
+    Чтение журнала изменений и раздача записей подписчикам процесса.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._last_poll = 0
+        # Пропущенные номера журнала: [первый, последний, время пропуска].
+        self._gaps = []
+        # Наибольший прочитанный номер, пропуски ниже него уже учтены.
+        self._scanned = 0
+
+    def subscribe(self, name: str, callback: Callable[[list], None],
+                  tables: set) -> Subscriber:
+        """
+        Подписка на изменения таблиц. Подписчик получает записи,
+        появившиеся после запуска (ChangeFeed.start).
+
+        Args:
+            name (str): имя подписчика для логов.
+            callback: функция, получающая список записей журнала.
+            tables (set): интересующие подписчика таблицы.
+
+        Returns:
+            Subscriber: подписчик.
+        """
+        subscriber = Subscriber(name, callback, tables)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def start(self) -> None:
+        """
+        Установка смещения подписчиков на конец журнала.
+        """
+        offset = latest_change()
+        with self._lock:
+            for subscriber in self._subscribers:
+                if subscriber.offset is None:
+                    subscriber.offset = offset
+
+    def poll(self, min_interval: float = 0) -> None:
+        """
+        Раздача подписчикам новых записей журнала. Записи, появившиеся
+        на месте пропущенных номеров в течение GAP_RESCAN секунд,
+        раздаются позже остальных.
+
+        Args:
+            min_interval (float): не читать журнал чаще,
+                                  чем раз в столько секунд.
+        """
+        if not self._subscribers:
+            return
+        now = time.monotonic()
+        if now - self._last_poll < min_interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._last_poll = now
+            for subscriber in self._subscribers:
+                if subscriber.offset is None:
+                    subscriber.offset = latest_change()
+            offset = min(
+                subscriber.offset for subscriber in self._subscribers)
+            changes = read_changes(offset)
+            late = self._read_gaps(now)
+            self._add_gaps(offset, changes, now)
+            for subscriber in self._subscribers:
+                entries = [change for change in changes
+                           if change.id > subscriber.offset]
+                missed = [change for change in late
+                          if change.id <= subscriber.offset]
+                if not entries and not missed:
+                    continue
+                relevant = [change for change in missed + entries
+                            if change.table_name in subscriber.tables]
+                if relevant:
+                    try:
+                        subscriber.callback(relevant)
+                    except Exception:
+                        logger.exception(
+                            f'Ошибка подписчика журнала {subscriber.name}')
+                        continue
+                if entries:
+                    subscriber.offset = entries[-1].id
+        finally:
+            self._lock.release()
+
+    def _add_gaps(self, offset: int, changes: list, now: float) -> None:
+        """
+        Запоминание номеров, через которые перешло чтение журнала.
+        """
+        expected = offset + 1
+        for change in changes:
+            first = max(expected, self._scanned + 1)
+            if first < change.id:
+                self._gaps.append([first, change.id - 1, now])
+            expected = change.id + 1
+        if changes:
+            self._scanned = max(self._scanned, changes[-1].id)
+
+    def _read_gaps(self, now: float) -> list:
+        """
+        Чтение записей, появившихся на месте пропущенных номеров.
+
+        Returns:
+            list: найденные записи журнала по возрастанию номера.
+        """
+        self._gaps = [gap for gap in self._gaps
+                      if now - gap[2] < GAP_RESCAN]
+        if not self._gaps:
+            return []
+        late = db.session.scalars(
+            select(Change_log).where(or_(*(
+                Change_log.id.between(first, last)
+                for first, last, _ in self._gaps)))
+            .order_by(Change_log.id)).all()
+        if not late:
+            return []
+        found = [change.id for change in late]
+        gaps = []
+        for first, last, seen in self._gaps:
+            position = bisect_left(found, first)
+            while position < len(found) and found[position] <= last:
+                if found[position] > first:
+                    gaps.append([first, found[position] - 1, seen])
+                first = found[position] + 1
+                position += 1
+            if first <= last:
+                gaps.append([first, last, seen])
+        self._gaps = gaps
+        return late
+
+
+def latest_change() -> int:
+    """
+    Номер последней записи журнала.
+    """
+    return db.session.scalar(select(func.max(Change_log.id))) or 0
+
+
+def table_version(table_name: str) -> int:
+    """
+    Версия данных таблицы: номер последней записи журнала о ней.
+    Пока версия не изменилась, построенное по таблице можно
+    использовать повторно.
+
+    Args:
+        table_name (str): имя таблицы.
+
+    Returns:
+        int: номер записи журнала или 0.
+    """
+    return db.session.scalar(
+        select(func.max(Change_log.id)).where(
+            Change_log.table_name == table_name)) or 0
+
+
+def read_changes(offset: int, limit: int = READ_LIMIT) -> list:
+    """
+    Чтение записей журнала после смещения без пропусков.
+    Чтение останавливается на пропущенном номере, если
+    его транзакция еще может зафиксироваться.
+
+    Args:
+        offset (int): номер последней прочитанной записи.
+        limit (int): наибольшее количество записей.
+
+    Returns:
+        list: объекты записей журнала по возрастанию номера.
+    """
+    changes = db.session.scalars(
+        select(Change_log).where(Change_log.id > offset)
+        .order_by(Change_log.id).limit(limit)).all()
+    settled = datetime.now() - timedelta(seconds=GAP_TIMEOUT)
+    expected = offset + 1
+    for position, change in enumerate(changes):
+        if change.id != expected and change.created > settled:
+            return changes[:position]
+        expected = change.id + 1
+    return changes
+
+
+change_feed = ChangeFeed()
+
+
+@app.before_request
+def poll_changes() -> None:
+    """
+    Получение изменений, сделанных другими процессами.
+    """
+    change_feed.poll(app.config.get('CHANGELOG_POLL_INTERVAL', 1))
+
+
+@app.cli.command('changelog-trim')
+@click.option('--days', default=7, show_default=True,
+              help='Сколько дней хранить записи журнала.')
+def changelog_trim(days: int) -> None:
+    """
+    Удаление старых записей журнала изменений. Последняя запись
+    каждой таблицы остается: по ней считается версия данных таблицы.
+    """
+    latest = db.session.scalars(
+        select(func.max(Change_log.id)).group_by(Change_log.table_name)).all()
+    result = db.session.execute(delete(Change_log).where(
+        Change_log.created < datetime.now() - timedelta(days=days),
+        Change_log.id.not_in(latest)))
+    db.session.commit()
+    click.echo(f'Удалено записей журнала: {result.rowcount}')
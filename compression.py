@@ -0,0 +1,282 @@
+"""
+Модуль сжимает ответы (brotli или gzip, по заголовку Accept-Encoding)
+и задает заголовки Cache-Control и Vary по обработчикам.
+Большие ответы сжимаются частями по мере отправки. Сжатые страницы
+для анонимных пользователей хранятся в памяти процесса и отдаются
+без вызова обработчика.
+"""
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+
+from flask import Response, g, request, session
+
+from main import app
+
+try:
+    import brotli
+except ImportError:
+    # Без пакета Brotli ответы сжимаются только gzip.
+    brotli = None
+
+# Типы ответов, которые имеет смысл сжимать.
+# text/event-stream не сжимается: события должны уходить клиенту сразу.
+COMPRESSIBLE = {
+    'text/html', 'text/plain', 'text/css', 'text/csv',
+    'application/json', 'application/javascript', 'image/svg+xml',
+    }
+# Ответы длиннее стольких байт сжимаются частями по мере отправки.
+STREAM_SIZE = 256 * 1024
+CHUNK_SIZE = 64 * 1024
+# Степень сжатия ответов и страниц, сжимаемых один раз для кэша.
+GZIP_LEVEL, GZIP_CACHED_LEVEL = 6, 9
+BROTLI_QUALITY, BROTLI_CACHED_QUALITY = 5, 11
+# Политика кэширования обработчиков без своей политики.
+DEFAULT_CACHE_CONTROL = 'private, no-cache'
+# Предел страниц в кэше: адрес страницы входа содержит ?next=.
+MAX_PAGES = 256
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Политика кэширования ответов обработчика.
+    """
+    cache_control: str
+    vary: tuple = ()
+    anonymous: bool = False
+
+
+def cache_policy(cache_control: str, vary: tuple = (),
+                 anonymous: bool = False):
+    """
+    Декоратор политики кэширования обработчика.
+
+    Args:
+        cache_control (str): значение заголовка Cache-Control.
+        vary (tuple): заголовки запроса для Vary.
+        anonymous (bool): страница одинакова для всех анонимных
+                          пользователей, ее сжатый текст кэшируется.
+                          Вошедшим пользователям отдается с
+                          DEFAULT_CACHE_CONTROL.
+    """
+    def decorator(view):
+        view.cache_policy = CachePolicy(cache_control, vary, anonymous)
+        return view
+    return decorator
+
+
+class Compressor:
+    """
+    Потоковое сжатие gzip или brotli.
+    """
+
+    def __init__(self, encoding: str, level: int) -> None:
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        """
+        Сжатые данные всех переданных частей без завершения потока.
+        """
+        if self.encoding == 'br':
+            return self._compressor.flush()
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """
+    Сжатие ответа целиком.
+    """
+    compressor = Compressor(encoding, level)
+    return compressor.process(data) + compressor.finish()
+
+
+def compress_chunks(chunks, encoding: str, level: int):
+    """
+    Сжатие ответа по частям. Каждая часть отправляется клиенту
+    сразу после сжатия.
+
+    Args:
+        chunks: части ответа (bytes).
+        encoding (str): br или gzip.
+        level (int): степень сжатия.
+
+    Yields:
+        bytes: сжатые данные.
+    """
+    compressor = Compressor(encoding, level)
+    for chunk in chunks:
+        if chunk:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+    yield compressor.finish()
+
+
+def split(data: bytes):
+    """
+    Части большого ответа без копирования.
+    """
+    view = memoryview(data)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield bytes(view[start:start + CHUNK_SIZE])
+
+
+def choose_encoding() -> str | None:
+    """
+    Выбор сжатия по заголовку Accept-Encoding.
+
+    Returns:
+        str: br, gzip или None.
+    """
+    accept = request.accept_encodings
+    if brotli is not None and accept.quality('br'):
+        return 'br'
+    if accept.quality('gzip'):
+        return 'gzip'
+    return None
+
+
+class PageCache:
+    """
+    Сжатые страницы для анонимных пользователей.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pages = {}
+
+    def get(self, key: tuple) -> tuple | None:
+        with self._lock:
+            page = self._pages.get(key)
+        if page is None or page[0] < time.monotonic():
+            return None
+        return page[1:]
+
+    def set(self, key: tuple, ttl: float, body: bytes,
+            content_type: str) -> None:
+        with self._lock:
+            if key not in self._pages and len(self._pages) >= MAX_PAGES:
+                del self._pages[next(iter(self._pages))]
+            self._pages[key] = (time.monotonic() + ttl, body, content_type)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+
+page_cache = PageCache()
+
+
+def current_policy() -> CachePolicy | None:
+    """
+    Политика кэширования обработчика текущего запроса.
+    """
+    view = app.view_functions.get(request.endpoint)
+    return getattr(view, 'cache_policy', None)
+
+
+def is_anonymous() -> bool:
+    """
+    Проверка, что страница будет одинаковой для всех анонимных
+    пользователей: пользователь не вошел и нет ожидающих уведомлений.
+    """
+    return '_user_id' not in session and '_flashes' not in session
+
+
+def cache_page(page_key: tuple, response: Response) -> None:
+    """
+    Сохранение готовой страницы в кэш на ANONYMOUS_PAGE_TTL секунд.
+    """
+    page_cache.set(page_key, app.config.get('ANONYMOUS_PAGE_TTL', 300),
+                   response.get_data(), response.content_type)
+
+
+@app.before_request
+def serve_cached_page() -> Response | None:
+    """
+    Выдача сжатой страницы из кэша без вызова обработчика.
+    """
+    policy = current_policy()
+    if (policy is None or not policy.anonymous
+            or request.method not in ('GET', 'HEAD') or not is_anonymous()):
+        return None
+    g.page_key = (request.full_path, choose_encoding())
+    page = page_cache.get(g.page_key)
+    if page is None:
+        return None
+    body, content_type = page
+    response = Response(body, content_type=content_type)
+    if g.page_key[1]:
+        response.headers['Content-Encoding'] = g.page_key[1]
+    response.headers['Cache-Control'] = policy.cache_control
+    response.vary.update(('Accept-Encoding', *policy.vary))
+    g.page_cached = True
+    return response
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """
+    Заголовки кэширования и сжатие ответа.
+    """
+    if g.get('page_cached'):
+        return response
+    policy = current_policy()
+    page_key = g.get('page_key')
+    if policy is not None and policy.anonymous and (
+            page_key is None or session.modified):
+        policy = None
+    if 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = (
+            policy.cache_control if policy else DEFAULT_CACHE_CONTROL)
+    if policy is not None:
+        response.vary.update(policy.vary)
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype not in COMPRESSIBLE
+            or 'Content-Encoding' in response.headers):
+        return response
+    if not response.is_streamed:
+        length = response.calculate_content_length()
+        if length < app.config.get('COMPRESSION_MIN_SIZE', 1024):
+            return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    cached = policy is not None and policy.anonymous
+    if encoding is None:
+        if cached:
+            cache_page(page_key, response)
+        return response
+    if encoding == 'br':
+        level = BROTLI_CACHED_QUALITY if cached else BROTLI_QUALITY
+    else:
+        level = GZIP_CACHED_LEVEL if cached else GZIP_LEVEL
+    response.headers['Content-Encoding'] = encoding
+    if response.is_streamed:
+        response.response = compress_chunks(
+            response.iter_encoded(), encoding, level)
+        response.headers.pop('Content-Length', None)
+    elif length > STREAM_SIZE and not cached:
+        response.response = compress_chunks(
+            split(response.get_data()), encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(compress(response.get_data(), encoding, level))
+        if cached:
+            cache_page(page_key, response)
+    return response
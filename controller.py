@@ -2,12 +2,23 @@
 Модуль содержит функции представления для шаблонов.
 """
 
-from flask import flash, redirect, render_template, request, url_for
-from flask_login import login_required, logout_user
+from datetime import date
 
+from flask import (Response, abort, flash, jsonify, redirect,
+                   render_template, request, url_for)
+from flask_login import current_user, login_required, logout_user
+
+import importer  # noqa: F401 (CLI-команды массовой загрузки)
+from admission import (client_ip, form_user, logged_user, password_hashing,
+                       rate_limit)
+from autocomplete import Autocomplete
+from compression import cache_policy
 from logger import logger
 from main import app
 from models import DataAccess, Articles, Defects
+from profiler import collapsed, sampler, speedscope
+from repair_feed import broadcaster
+from reports import DONE, fail_stale_jobs, submit_report
 
 
 # обьект для взаимодействия с базой данных.
@@ -16,6 +27,7 @@ dataAccess = DataAccess()
 
 @logger.catch
 @app.route('/')
+@cache_policy('public, max-age=60', vary=('Cookie',), anonymous=True)
 def index() -> str:
     """
     Обработчик для главной страницы.
@@ -55,11 +67,38 @@ def article(article_id: int) -> tuple[str, Articles]:
         articles: обьект статьи.
     """
     article = dataAccess.get_article(article_id)
-    return render_template('article.html', article=article)
+    if article is None:
+        abort(404)
+    first_section = dataAccess.get_article_section(article_id, 0)
+    return render_template(
+        'article.html', article=article, first_section=first_section)
+
+
+@logger.catch
+@app.route('/article/<int:article_id>/section/<int:number>')
+@cache_policy('private, max-age=300')
+@login_required
+def article_section(article_id: int, number: int) -> str:
+    """
+    Обработчик для подгрузки раздела статьи.
+
+    Args:
+        article_id (int): идентификатор статьи.
+        number (int): номер раздела.
+
+    Returns:
+        str: HTML-код раздела статьи.
+    """
+    section = dataAccess.get_article_section(article_id, number)
+    if section is None:
+        abort(404)
+    return section.html
 
 
 @logger.catch
 @app.route('/registration', methods=['GET', 'POST'])
+@cache_policy('public, max-age=60', vary=('Cookie',), anonymous=True)
+@rate_limit('10/hour', key=client_ip)
 def registration() -> str:
     """
     Обработчик для страницы регистрации пользователей.
@@ -80,7 +119,8 @@ def registration() -> str:
             {'title': "Ошибка",
                 'message': "Пароли не совпадают"}, 'error')
     else:
-        dataAccess.add_user(**forms)
+        with password_hashing.slot():
+            dataAccess.add_user(**forms)
         return redirect(url_for('login')), flash(
                                 {'title': "Успех",
                                  'message': "Вы зарегестрировались"}, 'success'
@@ -91,6 +131,9 @@ def registration() -> str:
 
 @logger.catch
 @app.route('/login', methods=['GET', 'POST'])
+@cache_policy('public, max-age=60', vary=('Cookie',), anonymous=True)
+@rate_limit('30/minute', key=client_ip)
+@rate_limit('5/minute', key=form_user)
 def login() -> str:
     """
     Обработчик для страницы входа в систему.
@@ -106,7 +149,9 @@ def login() -> str:
                 {'title': "Ошибка",
                     'message': "Заполните все поля"}, 'error')
         return render_template('login.html')
-    if dataAccess.get_user(**forms):
+    with password_hashing.slot():
+        user_found = dataAccess.get_user(**forms)
+    if user_found:
         next_page = request.args.get('next')
         return redirect(next_page or url_for('index'))
     else:
@@ -150,29 +195,67 @@ def redirect_to_sign(response) -> str:
 @logger.catch
 @app.route('/repair_information', methods=['GET', 'POST'])
 @login_required
-def repair_information() -> tuple[str, list]:
+@rate_limit('60/minute', key=client_ip)
+@rate_limit('20/minute', key=logged_user)
+def repair_information() -> str:
     """
     Обработчик для страницы информации о ремонтах.
 
     Returns:
         str: HTML-код страницы информации о ремонтах.
-        trains: список обьектов поездов.
     """
-    trains = dataAccess.get_trains()
     if request.method == 'GET':
-        return render_template('repair_inf.html', trains=trains)
+        return render_template('repair_inf.html')
     forms = dict(request.form)
     if check_all_fields_are_filled_in(forms, 7):
         flash(
                 {'title': "Ошибка",
                     'message': "Заполните все поля"}, 'error')
-        return render_template('repair_inf.html', trains=trains)
+        return render_template('repair_inf.html')
+    if not dataAccess.train_exists(forms['train']):
+        flash(
+                {'title': "Ошибка",
+                    'message': "Такого поезда нет"}, 'error')
+        return render_template('repair_inf.html')
+    if not dataAccess.defect_exists(forms['defect']):
+        flash(
+                {'title': "Ошибка",
+                    'message': "Такой неисправности нет в каталоге"}, 'error')
+        return render_template('repair_inf.html')
+    # Даты из формы приходят строкой 'ГГГГ-ММ-ДД'.
+    try:
+        forms['date'] = date.fromisoformat(forms['date'])
+    except ValueError:
+        flash(
+                {'title': "Ошибка",
+                    'message': "Неверная дата"}, 'error')
+        return render_template('repair_inf.html')
     dataAccess.add_repair_inf(**forms)
     flash(
                             {'title': "Успех",
                                 'message': "Запись добавлена"}, 'success'
                                 )
-    return render_template('repair_inf.html', trains=trains)
+    return render_template('repair_inf.html')
+
+
+@logger.catch
+@app.route('/autocomplete/<field>')
+@cache_policy('private, max-age=60')
+@login_required
+def autocomplete_field(field: str) -> Response:
+    """
+    Обработчик для подсказок при заполнении формы сведений о ремонте.
+
+    Args:
+        field (str): поле формы: train, executer, defect или s_def.
+
+    Returns:
+        Response: JSON-список подсказок для начала значения из ?q=.
+    """
+    if field not in Autocomplete.FIELDS:
+        abort(404)
+    suggestions = dataAccess.get_suggestions(field, request.args.get('q', ''))
+    return jsonify(suggestions or [])
 
 
 @logger.catch
@@ -206,14 +289,152 @@ def repair_history_continion() -> tuple[str, list]:
     end_date = request.form['end_date']
 
     if start_date and end_date:
-        repair_inf = dataAccess.get_repair_inf_with_date(
-            train, start_date, end_date)
+        try:
+            period = date.fromisoformat(start_date), date.fromisoformat(
+                end_date)
+        except ValueError:
+            flash(
+                    {'title': "Ошибка",
+                        'message': "Неверная дата"}, 'error')
+            return render_template(
+                'repair_history.html', trains=dataAccess.get_trains())
+        repair_inf = dataAccess.get_repair_inf_with_date(train, *period)
     else:
         repair_inf = dataAccess.get_repair_inf(train)
 
     return render_template(
         'repair_history_continion.html',
-        repair_inf=repair_inf
+        repair_inf=repair_inf,
+        train=train,
+        start_date=start_date,
+        end_date=end_date,
+        )
+
+
+@logger.catch
+@app.route('/repair_feed/<train>')
+@login_required
+def repair_feed(train: str) -> Response:
+    """
+    Поток новых записей о ремонте поезда (Server-Sent Events).
+    При переподключении клиент получает пропущенные записи
+    после события из заголовка Last-Event-ID.
+
+    Подписчик занимает поток сервера до отключения, поэтому их число
+    ограничено REPAIR_FEED_MAX_SUBSCRIBERS, сверх него отвечает 503.
+
+    Args:
+        train (str): наименование поезда.
+
+    Returns:
+        Response: поток text/event-stream.
+    """
+    broadcaster.configure(app)
+    limit = app.config.get('REPAIR_FEED_MAX_SUBSCRIBERS', 150)
+    if not broadcaster.join(limit):
+        logger.warning('Достигнуто наибольшее число подписчиков ленты')
+        abort(503)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    response = Response(
+        broadcaster.subscribe(train, last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+    response.call_on_close(broadcaster.leave)
+    return response
+
+
+@logger.catch
+@app.route('/reports', methods=['GET', 'POST'])
+@login_required
+def reports() -> str:
+    """
+    Обработчик для страницы отчетов. POST ставит отчет в очередь
+    и перенаправляет на страницу задания.
+
+    Returns:
+        str: HTML-код страницы отчетов.
+    """
+    if request.method == 'GET':
+        return render_template('reports.html')
+    try:
+        job = submit_report('monthly_depot', {
+            'month': request.form.get('month', ''),
+            'format': request.form.get('format', 'html'),
+            })
+    except ValueError:
+        flash(
+            {'title': "Ошибка",
+                'message': "Укажите месяц отчета"}, 'error')
+        return render_template('reports.html')
+    return redirect(url_for('report', job_id=job.id))
+
+
+@logger.catch
+@app.route('/reports/<int:job_id>')
+@login_required
+def report(job_id: int) -> str:
+    """
+    Обработчик для страницы задания на отчет.
+
+    Args:
+        job_id (int): идентификатор задания.
+
+    Returns:
+        str: HTML-код страницы отчетов со статусом задания.
+    """
+    fail_stale_jobs()
+    job = dataAccess.get_report_job(job_id)
+    if job is None:
+        abort(404)
+    return render_template('reports.html', job=job)
+
+
+@logger.catch
+@app.route('/reports/<int:job_id>/status')
+@cache_policy('no-store')
+@login_required
+def report_status(job_id: int) -> Response:
+    """
+    Обработчик для опроса статуса задания на отчет.
+
+    Args:
+        job_id (int): идентификатор задания.
+
+    Returns:
+        Response: JSON со статусом задания.
+    """
+    # Задание из пула перезапущенного воркера не завершится само.
+    fail_stale_jobs()
+    job = dataAccess.get_report_job(job_id)
+    if job is None:
+        abort(404)
+    return jsonify({'status': job.status, 'error': job.error})
+
+
+@logger.catch
+@app.route('/reports/<int:job_id>/download')
+@cache_policy('private, max-age=86400, immutable')
+@login_required
+def report_download(job_id: int) -> Response:
+    """
+    Обработчик для скачивания готового отчета.
+
+    Args:
+        job_id (int): идентификатор задания.
+
+    Returns:
+        Response: текст отчета.
+    """
+    job = dataAccess.get_report_job(job_id)
+    if job is None or job.status != DONE:
+        abort(404)
+    extension = 'csv' if job.content_type.startswith('text/csv') else 'html'
+    return Response(
+        job.result,
+        content_type=job.content_type,
+        headers={'Content-Disposition':
+                 f'attachment; filename=report_{job.id}.{extension}'},
         )
 
 
@@ -254,6 +475,34 @@ def diagnostics_sub_defect(sub_id: int) -> tuple[str, Defects]:
     return render_template('sub_defect.html', sub_defect=sub_defect)
 
 
+@logger.catch
+@app.route('/admin/profile', methods=['GET', 'POST'])
+@cache_policy('no-store')
+@login_required
+def profile() -> Response:
+    """
+    Обработчик для выгрузки результатов профилирования.
+    Доступен только пользователям из ADMIN_USERS.
+    GET ?format=speedscope выдает JSON для speedscope,
+    иначе collapsed stacks для flamegraph. POST очищает результаты.
+
+    Returns:
+        Response: накопленные стеки по обработчикам.
+    """
+    if current_user.get_id() not in app.config['ADMIN_USERS']:
+        abort(403)
+    if request.method == 'POST':
+        sampler.reset()
+        return Response(status=204)
+    stacks = sampler.snapshot()
+    endpoint = request.args.get('endpoint')
+    if endpoint:
+        stacks = {endpoint: stacks.get(endpoint, {})}
+    if request.args.get('format') == 'speedscope':
+        return jsonify(speedscope(stacks, sampler.interval))
+    return Response(collapsed(stacks), mimetype='text/plain')
+
+
 def check_all_fields_are_filled_in(forms: dict, fields: int) -> bool:
     """
     Функция проверяет что все поля формы заполнены.
@@ -0,0 +1,228 @@
+"""
+Модуль содержит CLI-команды для массовой загрузки
+каталога неисправностей и статей в базу данных.
+
+Примеры:
+    flask --app controller import-defects defects.csv
+    flask --app controller import-articles articles/
+"""
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import click
+from sqlalchemy import insert, select, tuple_, update
+
+from main import app, db
+from models import Articles, Defects
+
+# Размер пачки записей, загружаемых за один запрос.
+BATCH_SIZE = 1000
+
+
+def read_records(path: Path) -> Iterator[dict]:
+    """
+    Потоковое чтение записей из CSV, JSON или JSON Lines файла.
+
+    Args:
+        path (Path): путь к файлу.
+
+    Yields:
+        dict: очередная запись.
+    """
+    suffix = path.suffix.lower()
+    with path.open(encoding='utf-8-sig', newline='') as file:
+        if suffix == '.csv':
+            yield from csv.DictReader(file)
+        elif suffix == '.jsonl':
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        elif suffix == '.json':
+            yield from json.load(file)
+        else:
+            raise click.BadParameter(
+                f'Неподдерживаемый формат файла: {path.name}')
+
+
+def read_markdown(path: Path) -> Iterator[dict]:
+    """
+    Чтение статей из markdown файлов. Заголовком статьи служит
+    первая строка вида '# Заголовок', иначе имя файла.
+
+    Args:
+        path (Path): markdown файл или папка с markdown файлами.
+
+    Yields:
+        dict: статья с полями title и content.
+    """
+    files = sorted(path.glob('*.md')) if path.is_dir() else [path]
+    for file in files:
+        text = file.read_text(encoding='utf-8-sig')
+        first_line, _, rest = text.partition('\n')
+        if first_line.startswith('# '):
+            yield {'title': first_line[2:].strip(), 'content': rest.strip()}
+        else:
+            yield {'title': file.stem, 'content': text.strip()}
+
+
+def read_articles(path: Path) -> Iterator[dict]:
+    """
+    Чтение статей из файла или папки в зависимости от формата.
+
+    Args:
+        path (Path): путь к файлу или папке.
+
+    Yields:
+        dict: статья с полями title и content.
+    """
+    if path.is_dir() or path.suffix.lower() == '.md':
+        return read_markdown(path)
+    return read_records(path)
+
+
+def batches(records: Iterable[dict], size: int) -> Iterator[list]:
+    """
+    Разбиение потока записей на пачки.
+
+    Args:
+        records: поток записей.
+        size (int): размер пачки.
+
+    Yields:
+        list: пачка записей.
+    """
+    iterator = iter(records)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def upsert_defects(batch: list) -> int:
+    """
+    Добавление или обновление пачки неисправностей.
+    Запись определяется парой (defect, subspecies_defect).
+
+    Args:
+        batch (list): пачка записей с полями defect,
+                      subspecies_defect и repair.
+
+    Returns:
+        int: количество обработанных записей.
+    """
+    rows = {}
+    for record in batch:
+        if not record.get('defect'):
+            raise click.ClickException(
+                f'Не заполнено поле defect: {record}')
+        key = (record['defect'], record.get('subspecies_defect') or '')
+        rows[key] = {
+            'defect': key[0],
+            'subspecies_defect': key[1],
+            'repair': record.get('repair') or '',
+            }
+    existing = db.session.execute(
+        select(Defects.defect, Defects.subspecies_defect, Defects.id).where(
+            tuple_(Defects.defect, Defects.subspecies_defect).in_(
+                list(rows)))).all()
+    ids = {(defect, sub): id for defect, sub, id in existing}
+    updates = [{'id': ids[key], **row}
+               for key, row in rows.items() if key in ids]
+    inserts = [row for key, row in rows.items() if key not in ids]
+    if updates:
+        db.session.execute(update(Defects), updates)
+    if inserts:
+        db.session.execute(insert(Defects), inserts)
+    return len(rows)
+
+
+def upsert_articles(batch: list, seen_titles: set) -> int:
+    """
+    Добавление или обновление пачки статей по уникальному заголовку.
+
+    Args:
+        batch (list): пачка записей с полями title и content.
+        seen_titles (set): заголовки, уже загруженные в этом импорте.
+
+    Returns:
+        int: количество обработанных записей.
+    """
+    max_length = Articles.title.type.length
+    rows = {}
+    for record in batch:
+        title = (record.get('title') or '').strip()
+        if not title:
+            raise click.ClickException(
+                f'Не заполнено поле title: {record}')
+        if len(title) > max_length:
+            raise click.ClickException(
+                f'Заголовок длиннее {max_length} символов: {title}')
+        if title in seen_titles or title in rows:
+            raise click.ClickException(
+                f'Заголовок статьи повторяется: {title}')
+        rows[title] = {'title': title, 'content': record.get('content') or ''}
+    seen_titles.update(rows)
+    # Статьи сохраняются через ORM, чтобы при сохранении
+    # собрать их HTML-код и разделы.
+    existing = {
+        article.title: article
+        for article in Articles.query.filter(Articles.title.in_(list(rows)))
+        }
+    for title, row in rows.items():
+        article = existing.get(title) or Articles(title=title)
+        article.content = row['content']
+        db.session.add(article)
+    db.session.flush()
+    db.session.expunge_all()
+    return len(rows)
+
+
+def run_import(records: Iterable[dict], upsert, batch_size: int) -> None:
+    """
+    Загрузка записей пачками в одной транзакции с отчетом о скорости.
+
+    Args:
+        records: поток записей.
+        upsert: функция загрузки одной пачки.
+        batch_size (int): размер пачки.
+    """
+    started = time.perf_counter()
+    total = 0
+    try:
+        for batch in batches(records, batch_size):
+            total += upsert(batch)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    elapsed = time.perf_counter() - started
+    click.echo(
+        f'Загружено записей: {total} за {elapsed:.2f} с '
+        f'({total / elapsed if elapsed else total:.0f} записей/с)')
+
+
+@app.cli.command('import-defects')
+@click.argument('path', type=click.Path(exists=True, path_type=Path))
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True,
+              help='Количество записей в одной пачке.')
+def import_defects(path: Path, batch_size: int) -> None:
+    """
+    Загрузка каталога неисправностей из CSV, JSON или JSON Lines.
+    """
+    run_import(read_records(path), upsert_defects, batch_size)
+
+
+@app.cli.command('import-articles')
+@click.argument('path', type=click.Path(exists=True, path_type=Path))
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True,
+              help='Количество записей в одной пачке.')
+def import_articles(path: Path, batch_size: int) -> None:
+    """
+    Загрузка статей из CSV, JSON, JSON Lines или markdown файлов.
+    """
+    seen_titles = set()
+    run_import(read_articles(path),
+               lambda batch: upsert_articles(batch, seen_titles),
+               batch_size)
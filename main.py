@@ -12,12 +12,71 @@ from flask_toastr import Toastr
 
 from uuid import uuid4
 
+from replicas import RoutingSession, replica_binds
+
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DB')
 app.config['SECRET_KEY'] = str(uuid4())
+# Реплики для чтения (адреса через запятую).
+app.config['SQLALCHEMY_BINDS'] = replica_binds(os.getenv('DB_REPLICAS'))
+# Сколько секунд после записи пользователь читает из основной базы.
+app.config['REPLICA_MAX_LAG'] = float(os.getenv('REPLICA_MAX_LAG', 5))
+# Период проверки доступности реплик в секундах.
+app.config['REPLICA_HEALTH_INTERVAL'] = float(
+    os.getenv('REPLICA_HEALTH_INTERVAL', 30))
+
+# Хранилище лимитов запросов: 'memory' или 'sqlite:///путь/к/файлу'.
+app.config['RATE_LIMIT_STORE'] = os.getenv('RATE_LIMIT_STORE', 'memory')
+# Сколько хешей паролей может вычисляться одновременно и сколько секунд
+# запрос ждет свободного места (0 - сразу отклоняется с 429).
+app.config['PASSWORD_HASHING_CONCURRENCY'] = int(
+    os.getenv('PASSWORD_HASHING_CONCURRENCY', 4))
+app.config['PASSWORD_HASHING_TIMEOUT'] = float(
+    os.getenv('PASSWORD_HASHING_TIMEOUT', 0))
+
+# Индекс дат ремонтов в памяти и период его перестроения в секундах.
+app.config['REPAIR_DATE_INDEX'] = os.getenv('REPAIR_DATE_INDEX') == '1'
+app.config['REPAIR_DATE_INDEX_TTL'] = float(
+    os.getenv('REPAIR_DATE_INDEX_TTL', 300))
+
+# Общее для воркеров хранилище событий ленты ремонтов
+# ('sqlite:///путь/к/файлу'), без него лента работает в одном процессе.
+app.config['REPAIR_FEED_STORE'] = os.getenv('REPAIR_FEED_STORE')
+# Наибольшее число подписчиков ленты в воркере: каждый занимает поток,
+# значение должно быть меньше числа потоков воркера.
+app.config['REPAIR_FEED_MAX_SUBSCRIBERS'] = int(
+    os.getenv('REPAIR_FEED_MAX_SUBSCRIBERS', 150))
+
+# Идентификаторы пользователей-администраторов через запятую.
+app.config['ADMIN_USERS'] = [
+    user_id.strip()
+    for user_id in os.getenv('ADMIN_USERS', '').split(',') if user_id.strip()
+    ]
+# Доля профилируемых запросов (0 - выключено) и период выборки стеков.
+app.config['PROFILER_SAMPLE_RATE'] = float(
+    os.getenv('PROFILER_SAMPLE_RATE', 0))
+app.config['PROFILER_INTERVAL'] = float(os.getenv('PROFILER_INTERVAL', 0.01))
+
+# Период перестроения индексов автодополнения в секундах.
+app.config['AUTOCOMPLETE_TTL'] = float(os.getenv('AUTOCOMPLETE_TTL', 300))
+
+# Как часто процесс читает журнал изменений других процессов (секунды).
+app.config['CHANGELOG_POLL_INTERVAL'] = float(
+    os.getenv('CHANGELOG_POLL_INTERVAL', 1))
+
+# Сколько отчетов строится одновременно на все воркеры и через сколько
+# секунд незавершенное задание считается потерянным.
+app.config['REPORT_WORKERS'] = int(os.getenv('REPORT_WORKERS', 2))
+app.config['REPORT_JOB_TIMEOUT'] = float(os.getenv('REPORT_JOB_TIMEOUT', 600))
+
+# Ответы короче стольких байт не сжимаются. Сжатые страницы
+# для анонимных пользователей хранятся столько секунд.
+app.config['COMPRESSION_MIN_SIZE'] = int(
+    os.getenv('COMPRESSION_MIN_SIZE', 1024))
+app.config['ANONYMOUS_PAGE_TTL'] = float(os.getenv('ANONYMOUS_PAGE_TTL', 300))
 
 # База данных.
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
 manager = LoginManager(app)
 
 # Уведомления.
@@ -0,0 +1,64 @@
+"""article_sections.
+
+Revision ID: 3b7e52c1a9d4
+Revises: f745d9545c1b
+Create Date: 2026-10-19 10:12:41.218305
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+from article_renderer import render_article
+
+# revision identifiers, used by Alembic.
+revision = '3b7e52c1a9d4'
+down_revision = 'f745d9545c1b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('toc', sa.Text(), nullable=True))
+        batch_op.add_column(
+            sa.Column('sections_count', sa.Integer(), nullable=True))
+
+    sections = op.create_table('article_sections',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=True),
+    sa.Column('number', sa.Integer(), nullable=True),
+    sa.Column('html', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('article_sections', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_article_sections_article_id'),
+                              ['article_id'], unique=False)
+
+    # Сборка HTML-кода для уже существующих статей.
+    connection = op.get_bind()
+    articles = sa.table('articles',
+                        sa.column('id', sa.Integer),
+                        sa.column('content', sa.Text),
+                        sa.column('toc', sa.Text),
+                        sa.column('sections_count', sa.Integer))
+    for article_id, content in connection.execute(
+            sa.select(articles.c.id, articles.c.content)).all():
+        toc, html_sections = render_article(content)
+        connection.execute(
+            articles.update().where(articles.c.id == article_id).values(
+                toc=toc, sections_count=len(html_sections)))
+        op.bulk_insert(sections, [
+            {'article_id': article_id, 'number': number, 'html': html}
+            for number, html in enumerate(html_sections)
+            ])
+
+
+def downgrade():
+    with op.batch_alter_table('article_sections', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_article_sections_article_id'))
+
+    op.drop_table('article_sections')
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_column('sections_count')
+        batch_op.drop_column('toc')
@@ -2,12 +2,23 @@
 В данном модуле создаются метаданные для БД.
 """
 
+import threading
+from collections import defaultdict
+from itertools import chain
+
 from flask_login import UserMixin, login_user
 from flask_migrate import Migrate
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import load_only, undefer
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from article_renderer import render_article
+from autocomplete import autocomplete
+from changelog import INSERT, change_feed
 from logger import logger
 from main import app, db, manager
+from repair_feed import publish_repair
+from repair_index import repair_index
 
 migrate = Migrate(app, db)
 
@@ -77,6 +88,10 @@ class Repair_information(db.Model, BaseModel):
     train = db.Column(db.String(20))
     date = db.Column(db.Date)
 
+    __table_args__ = (
+        db.Index('ix_repair_information_train_date', 'train', 'date'),
+        )
+
     def __repr__(self) -> str:
         return (
             f'Иполнитель: {self.executer}\n'
@@ -92,11 +107,70 @@ class Articles(db.Model, BaseModel):
     Табличка 'Статьи'
     """
     title = db.Column(db.String(100), unique=True)
-    content = db.Column(db.Text)
+    # Исходный текст статьи в markdown.
+    content = db.deferred(db.Column(db.Text))
+    # HTML-код оглавления, собирается при сохранении.
+    toc = db.deferred(db.Column(db.Text))
+    sections_count = db.Column(db.Integer, default=0)
+    sections = db.relationship(
+        'Article_sections',
+        order_by='Article_sections.number',
+        cascade='all, delete-orphan',
+        )
 
     def __repr__(self) -> str:
         return (f'Статья: {self.name}')
 
+    def render(self) -> None:
+        """
+        Преобразование текста статьи в оглавление и разделы HTML.
+        """
+        self.toc, sections = render_article(self.content)
+        self.sections = [
+            Article_sections(number=number, html=html)
+            for number, html in enumerate(sections)
+            ]
+        self.sections_count = len(sections)
+
+
+class Article_sections(db.Model, BaseModel):
+    """
+    Табличка 'Разделы статей', готовый HTML-код статьи по разделам.
+    """
+    article_id = db.Column(
+        db.Integer, db.ForeignKey('articles.id'), index=True)
+    number = db.Column(db.Integer)
+    html = db.Column(db.Text)
+
+
+class Report_jobs(db.Model, BaseModel):
+    """
+    Табличка 'Задания на отчеты'. Готовый отчет хранится вместе
+    с версией данных, по которой он построен.
+    """
+    kind = db.Column(db.String(32))
+    # Параметры отчета в виде JSON с отсортированными ключами.
+    params = db.Column(db.String(255), index=True)
+    status = db.Column(db.String(16), default='queued', index=True)
+    data_version = db.Column(db.BigInteger)
+    content_type = db.Column(db.String(64))
+    result = db.deferred(db.Column(db.Text(length=2 ** 24)))
+    error = db.Column(db.String(255))
+    created = db.Column(db.DateTime)
+    started = db.Column(db.DateTime)
+    finished = db.Column(db.DateTime)
+
+
+@event.listens_for(db.session, 'before_flush')
+def render_changed_articles(session, flush_context, instances) -> None:
+    """
+    Преобразование статей, текст которых изменился, перед сохранением.
+    """
+    for obj in chain(session.new, session.dirty):
+        if (isinstance(obj, Articles)
+                and inspect(obj).attrs.content.history.has_changes()):
+            obj.render()
+
 
 class DataAccess:
     """
@@ -109,9 +183,10 @@ class DataAccess:
         Получение списка всех статей из базы данных.
 
         Returns:
-            articles: список объектов статей.
+            articles: список объектов статей (загружены только id и title).
         """
-        articles = Articles.query.all()
+        articles = Articles.query.options(
+            load_only(Articles.id, Articles.title)).all()
         return articles
 
     @logger.catch
@@ -125,9 +200,41 @@ class DataAccess:
         Returns:
             article: объект статьи.
         """
-        article = Articles.query.filter_by(id=article_id).first()
+        article = Articles.query.options(undefer(Articles.toc)).filter_by(
+            id=article_id).first()
         return article
 
+    @logger.catch
+    def get_article_section(self, article_id: int,
+                            number: int) -> Article_sections:
+        """
+        Получение раздела статьи по его номеру.
+
+        Args:
+            article_id (int): идентификатор статьи.
+            number (int): номер раздела, начиная с нуля.
+
+        Returns:
+            section: объект раздела статьи.
+        """
+        section = Article_sections.query.filter_by(
+            article_id=article_id, number=number).first()
+        return section
+
+    @logger.catch
+    def get_report_job(self, job_id: int) -> Report_jobs:
+        """
+        Получение задания на отчет по его идентификатору.
+
+        Args:
+            job_id (int): идентификатор задания.
+
+        Returns:
+            job: объект задания без текста отчета.
+        """
+        job = db.session.get(Report_jobs, job_id)
+        return job
+
     @logger.catch
     def add_user(self,
                  name: str,
@@ -152,6 +259,8 @@ class DataAccess:
             )
         db.session.add(new_user)
         db.session.commit()
+        autocomplete.add('executer', f'{name} {surname}')
+        change_feed.poll()
 
     @logger.catch
     def get_user(self, name: str, surname: str, password: str) -> bool | None:
@@ -184,6 +293,35 @@ class DataAccess:
         trains = Train.query.all()
         return trains
 
+    @logger.catch
+    def train_exists(self, train: str) -> bool:
+        """
+        Проверка, что поезд есть в базе данных.
+
+        Args:
+            train (str): наименование поезда.
+
+        Returns:
+            bool: True, если поезд найден.
+        """
+        return db.session.scalar(
+            select(Train.id).where(Train.train == train).limit(1)) is not None
+
+    @logger.catch
+    def defect_exists(self, defect: str) -> bool:
+        """
+        Проверка, что неисправность есть в каталоге неисправностей.
+
+        Args:
+            defect (str): неисправность.
+
+        Returns:
+            bool: True, если неисправность найдена.
+        """
+        return db.session.scalar(
+            select(Defects.id).where(Defects.defect == defect).limit(1)
+            ) is not None
+
     @logger.catch
     def add_repair_inf(self,
                        name: str,
@@ -215,7 +353,84 @@ class DataAccess:
             date=date
             )
         db.session.add(new_repair_information)
+        db.session.flush()
+        # Своя запись сразу попадает в индексы: чтение журнала может
+        # отложить ее (журнал читает другой поток или перед ней пропуск).
+        skip_repair_change(new_repair_information.id)
         db.session.commit()
+        add_repair_to_indexes(new_repair_information)
+        publish_repair(new_repair_information)
+        change_feed.poll()
+
+    def _date_index(self):
+        """
+        Индекс дат ремонтов в памяти, если он включен в REPAIR_DATE_INDEX.
+
+        Returns:
+            repair_index: индекс дат ремонтов или None.
+        """
+        if not app.config.get('REPAIR_DATE_INDEX'):
+            return None
+        repair_index.ensure_loaded(
+            lambda: db.session.execute(
+                select(Repair_information.train,
+                       Repair_information.date,
+                       Repair_information.id)
+                .where(Repair_information.train.is_not(None),
+                       Repair_information.date.is_not(None))
+                .order_by(Repair_information.train,
+                          Repair_information.date,
+                          Repair_information.id)),
+            app.config.get('REPAIR_DATE_INDEX_TTL', 300))
+        return repair_index
+
+    @logger.catch
+    def get_suggestions(self, field: str, prefix: str) -> list:
+        """
+        Подсказки для поля формы сведений о ремонте.
+
+        Args:
+            field (str): поле формы: train, executer, defect или s_def.
+            prefix (str): введенное начало значения.
+
+        Returns:
+            suggestions: список подсказок по убыванию частоты использования.
+        """
+        autocomplete.ensure_loaded(
+            self._suggestion_values,
+            app.config.get('AUTOCOMPLETE_TTL', 300))
+        suggestions = autocomplete.search(field, prefix)
+        return suggestions
+
+    def _suggestion_values(self):
+        """
+        Значения полей для автодополнения с частотой их использования.
+        Читаются в своем контексте приложения: индексы перестраиваются
+        в фоновом потоке.
+
+        Yields:
+            tuple: (поле, значение, вес).
+        """
+        def usage(column) -> dict:
+            return dict(db.session.execute(
+                select(column, func.count()).group_by(column)).all())
+
+        with app.app_context():
+            trains = usage(Repair_information.train)
+            executers = usage(Repair_information.executer)
+            defects = usage(Repair_information.defect)
+            for (train,) in db.session.execute(select(Train.train)):
+                yield 'train', train, trains.get(train, 0)
+            for name, surname in db.session.execute(
+                    select(Users.name, Users.surname)):
+                executer = f'{name} {surname}'
+                yield 'executer', executer, executers.get(executer, 0)
+            for (defect,) in db.session.execute(
+                    select(Defects.defect).distinct()):
+                yield 'defect', defect, defects.get(defect, 0)
+            for (sub_defect,) in db.session.execute(
+                    select(Defects.subspecies_defect).distinct()):
+                yield 's_def', sub_defect, 0
 
     @logger.catch
     def get_repair_inf_with_date(self, train: str,
@@ -233,9 +448,19 @@ class DataAccess:
         Returns:
             repair_inf: список объектов информации о ремонте.
         """
-        repair_inf = Repair_information.query.filter_by(
-            train=train).filter(
-                Repair_information.date.between(start_date, end_date)).all()
+        index = self._date_index()
+        if index is None:
+            repair_inf = Repair_information.query.filter_by(
+                train=train).filter(
+                    Repair_information.date.between(
+                        start_date, end_date)).all()
+            return repair_inf
+        ids = index.range_ids(train, start_date, end_date)
+        if not ids:
+            return []
+        rows = {row.id: row for row in Repair_information.query.filter(
+            Repair_information.id.in_(ids))}
+        repair_inf = [rows[row_id] for row_id in ids if row_id in rows]
         return repair_inf
 
     @logger.catch
@@ -282,9 +507,104 @@ class DataAccess:
         return sub_defect
 
 
+# Записи о ремонте, которые этот процесс добавляет в индексы сам.
+# Их записи журнала пропускаются, чтобы не учесть запись дважды.
+_indexed_repairs = set()
+_indexed_repairs_lock = threading.Lock()
+
+
+def skip_repair_change(row_id: int) -> None:
+    """
+    Пропуск записи журнала о вставке записи о ремонте,
+    которую процесс добавит в индексы сам.
+
+    Args:
+        row_id (int): идентификатор записи о ремонте.
+    """
+    with _indexed_repairs_lock:
+        _indexed_repairs.add(row_id)
+
+
+def add_repair_to_indexes(repair_information: Repair_information) -> None:
+    """
+    Добавление записи о ремонте в индекс дат и в веса подсказок.
+    """
+    repair_index.add(repair_information.train,
+                     repair_information.date,
+                     repair_information.id)
+    autocomplete.bump('train', repair_information.train)
+    autocomplete.bump('executer', repair_information.executer)
+    autocomplete.bump('defect', repair_information.defect)
+
+
+def on_repair_changes(changes: list) -> None:
+    """
+    Обновление индексов по журналу изменений записей о ремонте.
+    Новые записи добавляются в индексы, остальные изменения
+    сбрасывают индекс дат.
+
+    Args:
+        changes (list): записи журнала изменений.
+    """
+    inserted = [change.row_id for change in changes
+                if change.operation == INSERT and change.row_id is not None]
+    if len(inserted) != len(changes):
+        repair_index.invalidate()
+    with _indexed_repairs_lock:
+        fresh = [row_id for row_id in inserted
+                 if row_id not in _indexed_repairs]
+        _indexed_repairs.difference_update(inserted)
+    if not fresh:
+        return
+    for repair_information in Repair_information.query.filter(
+            Repair_information.id.in_(fresh)):
+        add_repair_to_indexes(repair_information)
+
+
+
+def on_catalog_changes(changes: list) -> None:
+    """
+    Обновление подсказок по журналу изменений поездов, пользователей
+    и неисправностей. Новые значения добавляются в индексы подсказок,
+    изменения и удаления сбрасывают индексы.
+
+    Args:
+        changes (list): записи журнала изменений.
+    """
+    if any(change.operation != INSERT or change.row_id is None
+           for change in changes):
+        autocomplete.invalidate()
+        return
+    inserted = defaultdict(list)
+    for change in changes:
+        inserted[change.table_name].append(change.row_id)
+    if inserted['train']:
+        for (train,) in db.session.execute(
+                select(Train.train).where(Train.id.in_(inserted['train']))):
+            autocomplete.add('train', train)
+    if inserted['users']:
+        for name, surname in db.session.execute(
+                select(Users.name, Users.surname)
+                .where(Users.id.in_(inserted['users']))):
+            autocomplete.add('executer', f'{name} {surname}')
+    if inserted['defects']:
+        for defect, sub_defect in db.session.execute(
+                select(Defects.defect, Defects.subspecies_defect)
+                .where(Defects.id.in_(inserted['defects']))):
+            autocomplete.add('defect', defect)
+            autocomplete.add('s_def', sub_defect)
+
+
+change_feed.subscribe(
+    'repair_index', on_repair_changes, {'repair_information'})
+change_feed.subscribe(
+    'autocomplete', on_catalog_changes, {'train', 'users', 'defects'})
+
+
 # Добавление метаданных в базу.
 with app.app_context():
     db.create_all()
+    change_feed.start()
 
 
 # Стандартная функция flask-login, для извлечения обьекта пользователя.
@@ -0,0 +1,194 @@
+"""
+Модуль содержит выборочный профилировщик запросов.
+Для доли PROFILER_SAMPLE_RATE запросов фоновый поток раз в
+PROFILER_INTERVAL секунд снимает стек потока, обрабатывающего запрос,
+и накапливает стеки по обработчикам. Результат выдается в формате
+collapsed stacks (flamegraph.pl) или speedscope.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import request
+
+from main import app
+
+# Предел различных стеков на обработчик, чтобы не расходовать память.
+MAX_STACKS = 5000
+# Имя стека, в который попадают выборки сверх предела.
+TRUNCATED = (('[другие стеки]', '', 0),)
+
+
+def frame_key(frame) -> tuple[str, str, int]:
+    """
+    Описание кадра стека: функция, файл и строка начала функции.
+    """
+    code = frame.f_code
+    filename = os.sep.join(code.co_filename.split(os.sep)[-2:])
+    return code.co_qualname, filename, code.co_firstlineno
+
+
+class Sampler:
+    """
+    Фоновый поток, снимающий стеки профилируемых запросов.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        # Идентификатор потока -> обработчик профилируемого запроса.
+        self._active = {}
+        self._stacks = defaultdict(Counter)
+        self._thread = None
+        self.interval = 0.01
+
+    def start_request(self, endpoint: str) -> None:
+        """
+        Включение выборки стеков для текущего потока.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._active[threading.get_ident()] = endpoint
+            self._wakeup.set()
+
+    def stop_request(self) -> None:
+        """
+        Выключение выборки стеков для текущего потока.
+        """
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._wakeup.clear()
+                    continue
+                active = dict(self._active)
+            frames = sys._current_frames()
+            for ident, endpoint in active.items():
+                frame = frames.get(ident)
+                if frame is None or ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_key(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                self._add(endpoint, tuple(stack))
+
+    def _add(self, endpoint: str, stack: tuple) -> None:
+        with self._lock:
+            stacks = self._stacks[endpoint]
+            if stack not in stacks and len(stacks) >= MAX_STACKS:
+                stack = TRUNCATED
+            stacks[stack] += 1
+
+    def snapshot(self) -> dict:
+        """
+        Копия накопленных стеков.
+
+        Returns:
+            dict: {обработчик: Counter(стек: число выборок)}.
+        """
+        with self._lock:
+            return {endpoint: Counter(stacks)
+                    for endpoint, stacks in self._stacks.items()}
+
+    def reset(self) -> None:
+        """
+        Очистка накопленных стеков.
+        """
+        with self._lock:
+            self._stacks.clear()
+
+
+sampler = Sampler()
+
+
+def collapsed(stacks: dict) -> str:
+    """
+    Стеки в формате collapsed stacks: 'обработчик;кадр;кадр число'.
+
+    Args:
+        stacks (dict): стеки из Sampler.snapshot.
+
+    Returns:
+        str: по строке на стек.
+    """
+    lines = []
+    for endpoint, counter in sorted(stacks.items()):
+        for stack, count in counter.most_common():
+            frames = [f'{name} ({filename}:{line})'.replace(';', ',')
+                      for name, filename, line in stack]
+            lines.append(f"{';'.join([endpoint, *frames])} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def speedscope(stacks: dict, interval: float) -> dict:
+    """
+    Стеки в формате speedscope, отдельный профиль на обработчик.
+
+    Args:
+        stacks (dict): стеки из Sampler.snapshot.
+        interval (float): период выборки в секундах.
+
+    Returns:
+        dict: документ speedscope.
+    """
+    frames = {}
+    profiles = []
+    for endpoint, counter in sorted(stacks.items()):
+        samples = []
+        weights = []
+        for stack, count in counter.most_common():
+            samples.append([frames.setdefault(key, len(frames))
+                            for key in stack])
+            weights.append(count * interval)
+        profiles.append({
+            'type': 'sampled',
+            'name': endpoint,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights,
+            })
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': [
+            {'name': name, 'file': filename, 'line': line}
+            for name, filename, line in frames
+            ]},
+        'profiles': profiles,
+        'name': 'Web_app_repair_electric_train',
+        'exporter': 'profiler.py',
+        }
+
+
+@app.before_request
+def start_profiling() -> None:
+    """
+    Включение профилирования для доли PROFILER_SAMPLE_RATE запросов.
+    """
+    rate = app.config.get('PROFILER_SAMPLE_RATE', 0)
+    if rate and request.endpoint and random.random() < rate:
+        sampler.interval = app.config.get('PROFILER_INTERVAL', 0.01)
+        sampler.start_request(request.endpoint)
+
+
+@app.teardown_request
+def stop_profiling(exception) -> None:
+    """
+    Выключение профилирования по завершении запроса.
+    """
+    if app.config.get('PROFILER_SAMPLE_RATE', 0):
+        sampler.stop_request()
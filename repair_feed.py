@@ -0,0 +1,250 @@
+"""
+Модуль рассылает новые записи о ремонте подписчикам через
+Server-Sent Events. События хранятся в кольцевом буфере процесса,
+а при заданном REPAIR_FEED_STORE дополнительно в файле SQLite,
+через который события видят все процессы-воркеры.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Iterator
+
+from flask import current_app
+
+from logger import logger
+
+# Сколько последних событий хранится для переподключившихся клиентов.
+BUFFER_SIZE = 1000
+# Период отправки пустого комментария, чтобы соединение не закрылось.
+HEARTBEAT = 15
+# Период опроса общего хранилища в секундах.
+POLL_INTERVAL = 0.5
+
+
+class SQLiteEventStore:
+    """
+    Общее для воркеров хранилище событий в файле SQLite.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._local = threading.local()
+        connection = self._connect()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS repair_events ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, train TEXT, data TEXT)')
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Соединение с файлом хранилища, отдельное для каждого потока.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def append(self, train: str, data: str) -> int:
+        """
+        Запись события в хранилище. События старше последних
+        BUFFER_SIZE удаляются: клиенту, отставшему сильнее,
+        они не выдаются и из буфера процесса.
+
+        Returns:
+            int: идентификатор события.
+        """
+        connection = self._connect()
+        event_id = connection.execute(
+            'INSERT INTO repair_events (train, data) VALUES (?, ?)',
+            (train, data)).lastrowid
+        connection.execute('DELETE FROM repair_events WHERE id <= ?',
+                           (event_id - BUFFER_SIZE,))
+        return event_id
+
+    def since(self, event_id: int, limit: int = BUFFER_SIZE) -> list:
+        """
+        События с идентификатором больше event_id.
+
+        Returns:
+            list: кортежи (id, поезд, данные) по возрастанию id.
+        """
+        return self._connect().execute(
+            'SELECT id, train, data FROM repair_events WHERE id > ? '
+            'ORDER BY id LIMIT ?', (event_id, limit)).fetchall()
+
+    def last_id(self) -> int:
+        """
+        Идентификатор последнего события.
+        """
+        row = self._connect().execute(
+            'SELECT MAX(id) FROM repair_events').fetchone()
+        return row[0] or 0
+
+
+class Broadcaster:
+    """
+    Рассылка событий подписчикам внутри процесса.
+    Подписчики ждут на условной переменной и не нагружают процессор,
+    пока новых событий нет, но каждый занимает поток сервера,
+    поэтому их число ограничено.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=BUFFER_SIZE)
+        self._last_id = 0
+        self._subscribers = 0
+        self._store = None
+        self._poller = None
+
+    def configure(self, app) -> None:
+        """
+        Подключение общего хранилища из REPAIR_FEED_STORE
+        ('sqlite:///путь/к/файлу') и запуск его опроса.
+        """
+        uri = app.config.get('REPAIR_FEED_STORE')
+        with self._condition:
+            if self._store is not None or not uri:
+                return
+            self._store = SQLiteEventStore(uri.removeprefix('sqlite:///'))
+            self._last_id = self._store.last_id()
+        self._poller = threading.Thread(target=self._poll, daemon=True)
+        self._poller.start()
+
+    def _poll(self) -> None:
+        """
+        Перенос событий других воркеров из общего хранилища.
+        """
+        while True:
+            time.sleep(POLL_INTERVAL)
+            try:
+                self._extend(self._store.since(self._last_id))
+            except sqlite3.Error as error:
+                logger.warning(f'Хранилище событий недоступно: {error}')
+
+    def _extend(self, rows: list) -> None:
+        with self._condition:
+            rows = [row for row in rows if row[0] > self._last_id]
+            if not rows:
+                return
+            self._events.extend(rows)
+            self._last_id = rows[-1][0]
+            self._condition.notify_all()
+
+    def publish(self, train: str, payload: dict) -> None:
+        """
+        Отправка события о новой записи ремонта.
+
+        Args:
+            train (str): наименование поезда.
+            payload (dict): данные записи.
+        """
+        data = json.dumps(payload, ensure_ascii=False, default=str)
+        if self._store is not None:
+            self._store.append(train, data)
+            self._extend(self._store.since(self._last_id))
+            return
+        with self._condition:
+            self._last_id += 1
+            event_id = self._last_id
+            self._events.append((event_id, train, data))
+            self._condition.notify_all()
+
+    def _replay(self, train: str, event_id: int) -> list:
+        """
+        События поезда после event_id для переподключившегося клиента.
+        """
+        with self._condition:
+            buffered = list(self._events)
+        if self._store is not None and (
+                not buffered or buffered[0][0] > event_id + 1):
+            buffered = self._store.since(event_id)
+        return [row for row in buffered
+                if row[0] > event_id and row[1] == train]
+
+    def join(self, limit: int) -> bool:
+        """
+        Регистрация подписчика.
+
+        Args:
+            limit (int): наибольшее число подписчиков процесса.
+
+        Returns:
+            bool: False, если подписчиков уже limit.
+        """
+        with self._condition:
+            if self._subscribers >= limit:
+                return False
+            self._subscribers += 1
+            return True
+
+    def leave(self) -> None:
+        """
+        Отключение подписчика, зарегистрированного join.
+        """
+        with self._condition:
+            self._subscribers -= 1
+
+    def subscribe(self, train: str, last_event_id: int | None) -> Iterator:
+        """
+        Поток событий SSE для поезда.
+
+        Args:
+            train (str): наименование поезда.
+            last_event_id (int): идентификатор последнего полученного
+                                 клиентом события из Last-Event-ID.
+
+        Yields:
+            str: сообщения в формате text/event-stream.
+        """
+        with self._condition:
+            cursor = self._last_id
+        if last_event_id is not None and last_event_id < cursor:
+            for event_id, _, data in self._replay(train, last_event_id):
+                if event_id <= cursor:
+                    yield format_event(event_id, data)
+        yield 'retry: 3000\n\n'
+        while True:
+            with self._condition:
+                if self._last_id <= cursor:
+                    self._condition.wait(HEARTBEAT)
+                events = [row for row in self._events if row[0] > cursor]
+                cursor = self._last_id
+            if not events:
+                yield ': heartbeat\n\n'
+            for event_id, event_train, data in events:
+                if event_train == train:
+                    yield format_event(event_id, data)
+
+
+def format_event(event_id: int, data: str) -> str:
+    """
+    Сообщение SSE о новой записи ремонта.
+    """
+    return f'id: {event_id}\nevent: repair\ndata: {data}\n\n'
+
+
+broadcaster = Broadcaster()
+
+
+def publish_repair(repair_information) -> None:
+    """
+    Рассылка новой записи ремонта подписчикам ее поезда.
+
+    Args:
+        repair_information: объект информации о ремонте.
+    """
+    broadcaster.configure(current_app)
+    broadcaster.publish(repair_information.train, {
+        'id': repair_information.id,
+        'train': repair_information.train,
+        'executer': repair_information.executer,
+        'defect': repair_information.defect,
+        'subspecies_defect': repair_information.subspecies_defect,
+        'brief_information': repair_information.brief_information,
+        'date': repair_information.date,
+        })
@@ -0,0 +1,143 @@
+"""
+Модуль содержит индекс дат ремонтов в памяти.
+Для каждого поезда хранятся отсортированные даты ремонтов
+(порядковые номера дней) и идентификаторы записей,
+поиск по периоду выполняется двоичным поиском.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Callable, Iterable
+
+
+def to_ordinal(value: date | str) -> int:
+    """
+    Перевод даты или строки 'ГГГГ-ММ-ДД' в порядковый номер дня.
+    """
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
+
+
+class RepairIndex:
+    """
+    Индекс записей ремонта по поезду и дате.
+    Записи, добавленные во время построения, повторяются
+    в новом индексе перед его заменой.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        # Поезд -> (даты, идентификаторы записей).
+        self._trains = {}
+        self._loaded_at = None
+        self._version = 0
+        # Записи, добавленные во время построения индекса.
+        self._journal = None
+
+    def ensure_loaded(self, loader: Callable[[], Iterable],
+                      ttl: float) -> None:
+        """
+        Построение индекса, если он не построен или устарел.
+        Записи, добавленные другими процессами, попадают
+        в индекс при перестроении раз в ttl секунд.
+
+        Args:
+            loader: функция, возвращающая строки (поезд, дата, id),
+                    упорядоченные по поезду, дате и id.
+            ttl (float): время жизни индекса в секундах.
+        """
+        if not self._expired(ttl):
+            return
+        with self._build_lock:
+            if not self._expired(ttl):
+                return
+            with self._lock:
+                version = self._version
+                self._journal = []
+            try:
+                trains = {}
+                for train, day, row_id in loader():
+                    dates, ids = trains.setdefault(
+                        train, (array('l'), array('l')))
+                    dates.append(day.toordinal())
+                    ids.append(row_id)
+                with self._lock:
+                    for train, ordinal, row_id in self._journal:
+                        self._insert(trains, train, ordinal, row_id)
+                    self._trains = trains
+                    # Сброс во время построения требует еще одного.
+                    if version == self._version:
+                        self._loaded_at = time.monotonic()
+            finally:
+                with self._lock:
+                    self._journal = None
+
+    def _expired(self, ttl: float) -> bool:
+        return (self._loaded_at is None
+                or time.monotonic() - self._loaded_at >= ttl)
+
+    def add(self, train: str, day: date | str, row_id: int) -> None:
+        """
+        Добавление записи в индекс.
+
+        Args:
+            train (str): наименование поезда.
+            day: дата ремонта.
+            row_id (int): идентификатор записи.
+                          Повторное добавление записи ничего не меняет.
+        """
+        ordinal = to_ordinal(day)
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((train, ordinal, row_id))
+            if self._loaded_at is not None:
+                self._insert(self._trains, train, ordinal, row_id)
+
+    @staticmethod
+    def _insert(trains: dict, train: str, ordinal: int,
+                row_id: int) -> None:
+        dates, ids = trains.setdefault(train, (array('l'), array('l')))
+        position = bisect_right(dates, ordinal)
+        if row_id in ids[bisect_left(dates, ordinal):position]:
+            return
+        dates.insert(position, ordinal)
+        ids.insert(position, row_id)
+
+    def invalidate(self) -> None:
+        """
+        Сброс индекса, он будет перестроен при следующем обращении.
+        """
+        with self._lock:
+            self._version += 1
+            self._loaded_at = None
+
+    def _bounds(self, train: str, start: date | str,
+                end: date | str) -> tuple[array, int, int]:
+        dates, ids = self._trains.get(train, (array('l'), array('l')))
+        low = bisect_left(dates, to_ordinal(start))
+        high = bisect_right(dates, to_ordinal(end))
+        return ids, low, max(low, high)
+
+    def range_ids(self, train: str, start: date | str,
+                  end: date | str) -> list:
+        """
+        Идентификаторы записей ремонта поезда за период, по дате.
+
+        Args:
+            train (str): наименование поезда.
+            start: начальная дата периода.
+            end: конечная дата периода.
+
+        Returns:
+            list: идентификаторы записей.
+        """
+        with self._lock:
+            ids, low, high = self._bounds(train, start, end)
+            return ids[low:high].tolist()
+
+
+repair_index = RepairIndex()
@@ -0,0 +1,166 @@
+"""
+Модуль распределяет запросы к БД между основной базой и репликами.
+Запись и чтение после записи идут в основную базу,
+остальное чтение в запросах пользователей - в реплики по кругу.
+"""
+import itertools
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import (current_app, g, has_app_context, has_request_context,
+                   session)
+from flask_sqlalchemy.session import Session
+
+from logger import logger
+
+# Префикс ключей SQLALCHEMY_BINDS, под которыми хранятся реплики.
+REPLICA_BIND_PREFIX = 'replica_'
+
+
+def replica_binds(uris: str | None) -> dict:
+    """
+    Формирование SQLALCHEMY_BINDS для реплик.
+
+    Args:
+        uris (str): адреса реплик через запятую.
+
+    Returns:
+        dict: словарь {ключ реплики: адрес реплики}.
+    """
+    if not uris:
+        return {}
+    return {
+        f'{REPLICA_BIND_PREFIX}{number}': uri.strip()
+        for number, uri in enumerate(uris.split(','))
+        if uri.strip()
+        }
+
+
+class ReplicaPool:
+    """
+    Класс выбирает реплику по кругу и следит за ее доступностью.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._keys = ()
+        self._cycle = iter(())
+        # Ключ реплики -> время следующей проверки доступности.
+        self._next_check = {}
+        self._healthy = {}
+
+    def choose(self, engines: dict, interval: float) -> sa.Engine | None:
+        """
+        Выбор следующей доступной реплики.
+
+        Args:
+            engines (dict): движки flask-sqlalchemy по ключам привязки.
+            interval (float): период проверки доступности в секундах.
+
+        Returns:
+            Engine: движок реплики, None если доступных реплик нет.
+        """
+        keys = tuple(sorted(
+            key for key in engines
+            if key and key.startswith(REPLICA_BIND_PREFIX)))
+        if not keys:
+            return None
+        with self._lock:
+            if keys != self._keys:
+                self._keys = keys
+                self._cycle = itertools.cycle(keys)
+            candidates = [next(self._cycle) for _ in keys]
+        for key in candidates:
+            if self._is_healthy(key, engines[key], interval):
+                return engines[key]
+        return None
+
+    def _is_healthy(self, key: str, engine: sa.Engine,
+                    interval: float) -> bool:
+        """
+        Проверка доступности реплики не чаще чем раз в interval секунд.
+
+        Args:
+            key (str): ключ реплики.
+            engine (Engine): движок реплики.
+            interval (float): период проверки доступности в секундах.
+
+        Returns:
+            bool: True, если реплика доступна.
+        """
+        now = time.monotonic()
+        if now < self._next_check.get(key, 0):
+            return self._healthy[key]
+        try:
+            with engine.connect() as connection:
+                connection.execute(sa.text('SELECT 1'))
+            healthy = True
+        except sa.exc.SQLAlchemyError as error:
+            logger.warning(f'Реплика {key} недоступна: {error}')
+            healthy = False
+        self._healthy[key] = healthy
+        self._next_check[key] = now + interval
+        return healthy
+
+
+replica_pool = ReplicaPool()
+
+
+def mark_write() -> None:
+    """
+    Отметка о записи в основную базу. До конца запроса и в течение
+    REPLICA_MAX_LAG секунд чтение для пользователя идет из основной базы.
+    """
+    if not has_app_context():
+        return
+    g.db_write = True
+    if has_request_context():
+        session['db_last_write'] = time.time()
+
+
+def read_from_primary() -> bool:
+    """
+    Проверка, нужно ли читать из основной базы.
+
+    Вне запроса (CLI-команды, процессы отчетов, чтение журнала
+    изменений при запуске) чтение всегда идет из основной базы:
+    отставание реплик там не по чему учесть, а такие чтения обычно
+    ищут только что записанные данные.
+
+    Returns:
+        bool: True, если чтение идет вне запроса, в этом запросе была
+              запись или реплики могли еще не получить последнюю
+              запись пользователя.
+    """
+    if not has_app_context():
+        return False
+    if not has_request_context() or g.get('db_write'):
+        return True
+    last_write = session.get('db_last_write')
+    max_lag = current_app.config.get('REPLICA_MAX_LAG', 0)
+    return last_write is not None and time.time() - last_write < max_lag
+
+
+class RoutingSession(Session):
+    """
+    Сессия flask-sqlalchemy, отправляющая чтение в реплики.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(
+            mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if (bind is not None or self._flushing
+                or isinstance(clause, sa.UpdateBase)
+                or primary is not self._db.engines.get(None)
+                or read_from_primary()):
+            return primary
+        replica = replica_pool.choose(
+            self._db.engines,
+            current_app.config.get('REPLICA_HEALTH_INTERVAL', 30))
+        return replica or primary
+
+
+@sa.event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(db_session, flush_context) -> None:
+    mark_write()
@@ -0,0 +1,312 @@
+"""
+Модуль строит тяжелые отчеты в фоновых процессах.
+Запрос только ставит задание в таблицу report_jobs и узнает его статус,
+отчет строится в пуле процессов. Число строящихся отчетов ограничено
+на все воркеры по таблице report_jobs. Готовый отчет используется
+повторно для тех же параметров, пока не изменились записи о ремонте.
+"""
+import csv
+import io
+import json
+import multiprocessing
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+
+import click
+from flask import render_template
+from sqlalchemy import and_, or_, select, update
+
+from changelog import table_version
+from logger import logger
+from main import app, db
+from models import Repair_information, Report_jobs
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+FORMATS = {'html': 'text/html; charset=utf-8',
+           'csv': 'text/csv; charset=utf-8'}
+# Как часто задание, ожидающее свободного места, проверяет его, в секундах.
+CLAIM_INTERVAL = 1
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Пул процессов для построения отчетов. Его размер REPORT_WORKERS
+    равен общему для всех воркеров пределу строящихся отчетов:
+    больше заданий процесса одновременно не начнется.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config.get('REPORT_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+                )
+        return _executor
+
+
+def reset_executor(executor: ProcessPoolExecutor) -> None:
+    """
+    Замена пула, который сломался после гибели процесса
+    (например, при нехватке памяти). Следующее задание получит новый пул.
+
+    Args:
+        executor: сломанный пул.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def monthly_depot(params: dict) -> str:
+    """
+    Месячный отчет депо: ремонты каждого поезда,
+    сгруппированные по неисправностям.
+
+    Args:
+        params (dict): month - месяц 'ГГГГ-ММ', format - html или csv.
+
+    Returns:
+        str: текст отчета.
+    """
+    start = date.fromisoformat(params['month'] + '-01')
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    groups = defaultdict(Counter)
+    rows = db.session.execute(
+        select(Repair_information.train,
+               Repair_information.defect,
+               Repair_information.subspecies_defect)
+        .where(Repair_information.date.between(start, end))
+        .execution_options(yield_per=1000))
+    for train, defect, sub_defect in rows:
+        groups[train][defect, sub_defect] += 1
+    trains = [
+        (train, sorted(groups[train].items(), key=lambda item: -item[1]))
+        for train in sorted(groups, key=lambda train: train or '')
+        ]
+    if params['format'] == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['Поезд', 'Неисправность',
+                         'Разновидность неисправности', 'Количество'])
+        for train, defects in trains:
+            for (defect, sub_defect), count in defects:
+                writer.writerow([train, defect, sub_defect, count])
+        return output.getvalue()
+    return render_template(
+        'report_monthly_depot.html', month=params['month'], trains=trains)
+
+
+REPORTS = {'monthly_depot': monthly_depot}
+
+
+def check_params(kind: str, params: dict) -> None:
+    """
+    Проверка параметров отчета.
+
+    Raises:
+        ValueError: неизвестный отчет или неверные параметры.
+    """
+    if kind not in REPORTS:
+        raise ValueError(f'Неизвестный отчет: {kind}')
+    if params.get('format') not in FORMATS:
+        raise ValueError('Формат отчета должен быть html или csv')
+    date.fromisoformat(str(params.get('month')) + '-01')
+
+
+def submit_report(kind: str, params: dict) -> Report_jobs:
+    """
+    Постановка задания на отчет. Если отчет с такими параметрами
+    уже построен по текущим данным или строится, возвращается
+    существующее задание.
+
+    Args:
+        kind (str): вид отчета.
+        params (dict): параметры отчета.
+
+    Returns:
+        job: объект задания.
+    """
+    check_params(kind, params)
+    params = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    version = table_version('repair_information')
+    fail_stale_jobs()
+    job = db.session.scalars(
+        select(Report_jobs)
+        .where(Report_jobs.kind == kind,
+               Report_jobs.params == params,
+               Report_jobs.data_version == version,
+               Report_jobs.status.in_([QUEUED, RUNNING, DONE]))
+        .order_by(Report_jobs.id.desc())).first()
+    if job is not None:
+        return job
+    job = Report_jobs(kind=kind, params=params, status=QUEUED,
+                      data_version=version,
+                      content_type=FORMATS[json.loads(params)['format']],
+                      created=datetime.now())
+    db.session.add(job)
+    db.session.commit()
+    # Сломанный пул заменяется, и задание отправляется в новый.
+    for _ in range(2):
+        executor = get_executor()
+        try:
+            future = executor.submit(run_report_job, job.id)
+        except BrokenProcessPool as error:
+            logger.warning(f'Пул процессов отчетов сломан: {error}')
+            reset_executor(executor)
+            continue
+        future.add_done_callback(
+            lambda future, job_id=job.id, executor=executor:
+            check_report_job(job_id, future, executor))
+        return job
+    fail_report_job(job.id, 'Не удалось запустить построение отчета')
+    return job
+
+
+def check_report_job(job_id: int, future: Future,
+                     executor: ProcessPoolExecutor) -> None:
+    """
+    Проверка завершения задания в пуле. Если процесс пула погиб,
+    задание отмечается ошибочным, а пул заменяется.
+
+    Args:
+        job_id (int): идентификатор задания.
+        future: результат выполнения задания в пуле.
+        executor: пул, выполнявший задание.
+    """
+    if future.cancelled():
+        fail_report_job(job_id, 'Построение отчета отменено')
+        return
+    error = future.exception()
+    if error is None:
+        return
+    if isinstance(error, BrokenProcessPool):
+        reset_executor(executor)
+    fail_report_job(job_id, f'{type(error).__name__}: {error}')
+
+
+def fail_stale_jobs() -> None:
+    """
+    Отметка ошибочными заданий, не завершенных за REPORT_JOB_TIMEOUT
+    секунд: ожидающих в очереди с момента создания или строящихся
+    с момента начала. Так завершаются задания из пула воркера,
+    который был перезапущен, и такой отчет можно заказать заново.
+    """
+    now = datetime.now()
+    deadline = now - timedelta(
+        seconds=app.config.get('REPORT_JOB_TIMEOUT', 600))
+    result = db.session.execute(
+        update(Report_jobs)
+        .where(or_(
+            and_(Report_jobs.status == QUEUED,
+                 Report_jobs.created < deadline),
+            and_(Report_jobs.status == RUNNING,
+                 Report_jobs.started < deadline)))
+        .values(status=FAILED, finished=now,
+                error='Отчет не построен за отведенное время'))
+    db.session.commit()
+    if result.rowcount:
+        logger.warning(f'Заданий на отчет не завершено: {result.rowcount}')
+
+
+def fail_report_job(job_id: int, error: str) -> None:
+    """
+    Отметка незавершенного задания ошибочным.
+
+    Args:
+        job_id (int): идентификатор задания.
+        error (str): описание ошибки.
+    """
+    with app.app_context():
+        job = db.session.get(Report_jobs, job_id)
+        if job is None or job.status not in (QUEUED, RUNNING):
+            return
+        job.status = FAILED
+        job.error = error[:255]
+        job.finished = datetime.now()
+        db.session.commit()
+
+
+def claim_report_job(job_id: int) -> bool:
+    """
+    Начало построения задания. Одновременно строится не больше
+    REPORT_WORKERS отчетов на все воркеры: строящиеся задания
+    считаются в report_jobs под блокировкой их строк. Пока мест нет,
+    задание ждет в очереди.
+
+    Args:
+        job_id (int): идентификатор задания.
+
+    Returns:
+        bool: True, если построение начато, False, если задания нет
+              или оно уже не в очереди.
+    """
+    limit = app.config.get('REPORT_WORKERS', 2)
+    while True:
+        deadline = datetime.now() - timedelta(
+            seconds=app.config.get('REPORT_JOB_TIMEOUT', 600))
+        running = db.session.scalars(
+            select(Report_jobs.id)
+            .where(Report_jobs.status == RUNNING,
+                   Report_jobs.started >= deadline)
+            .with_for_update()).all()
+        if len(running) < limit:
+            claimed = db.session.execute(
+                update(Report_jobs)
+                .where(Report_jobs.id == job_id,
+                       Report_jobs.status == QUEUED)
+                .values(status=RUNNING, started=datetime.now())).rowcount
+            db.session.commit()
+            return claimed == 1
+        db.session.commit()
+        status = db.session.scalar(
+            select(Report_jobs.status).where(Report_jobs.id == job_id))
+        if status != QUEUED:
+            return False
+        time.sleep(CLAIM_INTERVAL)
+
+
+def run_report_job(job_id: int) -> None:
+    """
+    Построение отчета в процессе пула.
+
+    Args:
+        job_id (int): идентификатор задания.
+    """
+    with app.app_context():
+        if not claim_report_job(job_id):
+            logger.error(f'Задание на отчет {job_id} не найдено '
+                         'или уже не в очереди')
+            return
+        job = db.session.get(Report_jobs, job_id)
+        try:
+            job.result = REPORTS[job.kind](json.loads(job.params))
+            job.status = DONE
+        except Exception as error:
+            logger.exception(f'Ошибка построения отчета {job_id}')
+            db.session.rollback()
+            job.status = FAILED
+            job.error = str(error)[:255]
+        job.finished = datetime.now()
+        db.session.commit()
+
+
+@app.cli.command('reports-trim')
+def reports_trim() -> None:
+    """
+    Удаление отчетов, построенных по устаревшим данным.
+    """
+    version = table_version('repair_information')
+    deleted = Report_jobs.query.filter(
+        Report_jobs.data_version != version,
+        Report_jobs.status.in_([DONE, FAILED])).delete()
+    db.session.commit()
+    click.echo(f'Удалено отчетов: {deleted}')
@@ -0,0 +1,169 @@
+"""
+Общие фикстуры тестов.
+Приложение запускается на базе SQLite в памяти: схема создается один раз
+при импорте models, тестовые данные записываются один раз за сессию.
+Каждый тест выполняется внутри транзакции соединения, фиксации
+приложения превращаются в SAVEPOINT, а по завершении теста транзакция
+откатывается, и база возвращается к исходным данным.
+При запуске через pytest-xdist у каждого процесса своя база.
+"""
+import os
+from concurrent.futures import Future
+from datetime import date
+
+# Настройки задаются до импорта приложения: main читает их при импорте.
+os.environ['DB'] = 'sqlite://'
+for name in ('DB_REPLICAS', 'RATE_LIMIT_STORE', 'REPAIR_FEED_STORE',
+             'REPAIR_DATE_INDEX', 'PROFILER_SAMPLE_RATE', 'ADMIN_USERS'):
+    os.environ.pop(name, None)
+
+import pytest  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import autocomplete as autocomplete_module  # noqa: E402
+import models  # noqa: E402
+import reports  # noqa: E402
+from autocomplete import autocomplete  # noqa: E402
+from changelog import change_feed  # noqa: E402
+from compression import page_cache  # noqa: E402
+from controller import app  # noqa: E402
+from logger import logger  # noqa: E402
+from main import db  # noqa: E402
+from models import (Articles, Defects, Repair_information,  # noqa: E402
+                    Train, Users)
+from repair_index import repair_index  # noqa: E402
+
+# Логи тестов не пишутся в debug.log рядом с кодом.
+logger.remove()
+
+PASSWORD = 'secret'
+ARTICLE = '''# Контактор
+
+Вступление.
+
+## Осмотр
+
+Осмотреть контакты.
+
+## Замена
+
+Заменить контактор.
+'''
+
+
+def seed() -> dict:
+    """
+    Запись тестовых данных.
+
+    Returns:
+        dict: идентификаторы созданных записей.
+    """
+    user = Users(name='Иван', surname='Петров',
+                 password=generate_password_hash(PASSWORD), post='Слесарь')
+    article = Articles(title='Контактор', content=ARTICLE)
+    defect = Defects(defect='Цепи управления',
+                     subspecies_defect='Не включается контактор',
+                     repair='Заменить контактор')
+    db.session.add_all([
+        user, article, defect,
+        Train(train='ЭП2Д-0001', location='Депо'),
+        Train(train='ЭП2Д-0002', location='Депо'),
+        Defects(defect='Цепи управления',
+                subspecies_defect='Не горит лампа',
+                repair='Заменить лампу'),
+        ])
+    for day, train in ((1, 'ЭП2Д-0001'), (5, 'ЭП2Д-0001'),
+                       (20, 'ЭП2Д-0001'), (3, 'ЭП2Д-0002')):
+        db.session.add(Repair_information(
+            executer='Иван Петров', train=train, defect='Цепи управления',
+            subspecies_defect='Не включается контактор',
+            brief_information='Заменен контактор',
+            date=date(2024, 3, day)))
+    db.session.commit()
+    return {'user': user.id, 'article': article.id, 'defect': defect.id}
+
+
+@pytest.fixture(scope='session')
+def fixture_ids() -> dict:
+    """
+    Подготовка базы: управление транзакциями передается SQLAlchemy,
+    чтобы SAVEPOINT работали в pysqlite, затем записываются данные.
+    """
+    with app.app_context():
+        engine = db.engine
+        event.listen(engine, 'begin',
+                     lambda connection: connection.exec_driver_sql('BEGIN'))
+        # В памяти у движка одно соединение на все сессии.
+        with engine.connect() as connection:
+            connection.connection.driver_connection.isolation_level = None
+        ids = seed()
+        db.session.remove()
+        db.session.configure(join_transaction_mode='create_savepoint')
+    return ids
+
+
+@pytest.fixture(autouse=True)
+def snapshot(fixture_ids, monkeypatch):
+    """
+    Выполнение теста в транзакции, которая откатывается после него.
+    """
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        monkeypatch.setitem(db.engines, None, connection)
+        app.extensions.pop('rate_limit_store', None)
+        repair_index.invalidate()
+        autocomplete.invalidate()
+        page_cache.clear()
+        models._indexed_repairs.clear()
+        for subscriber in change_feed._subscribers:
+            subscriber.offset = None
+        yield
+        db.session.remove()
+        transaction.rollback()
+        connection.close()
+
+
+class InlineExecutor:
+    """
+    Построение отчетов в процессе теста: процесс пула
+    не видит базу в памяти.
+    """
+
+    def submit(self, function, *args) -> Future:
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+
+@pytest.fixture(autouse=True)
+def inline_reports(monkeypatch):
+    monkeypatch.setattr(reports, 'get_executor', InlineExecutor)
+    monkeypatch.setattr(reports, 'reset_executor', lambda executor: None)
+
+
+@pytest.fixture(autouse=True)
+def inline_autocomplete(monkeypatch):
+    """
+    Перестроение подсказок в потоке теста: фоновый поток не видит
+    его транзакцию.
+    """
+    monkeypatch.setattr(autocomplete_module, 'run_in_background',
+                        lambda function: function())
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.fixture
+def logged_client(client, fixture_ids):
+    """
+    Клиент с вошедшим пользователем (без проверки пароля).
+    """
+    with client.session_transaction() as session:
+        session['_user_id'] = str(fixture_ids['user'])
+        session['_fresh'] = True
+    return client
@@ -0,0 +1,64 @@
+"""
+Тесты ограничения частоты запросов и числа проверок паролей.
+"""
+import threading
+
+import pytest
+from werkzeug.exceptions import TooManyRequests
+
+import admission
+from admission import ConcurrencyLimiter, MemoryStore, SQLiteStore
+from controller import app
+
+
+def test_memory_store_limits_rate():
+    store = MemoryStore()
+    assert [store.take('ключ', 1, 2) for _ in range(2)] == [0, 0]
+    assert 0 < store.take('ключ', 1, 2) <= 1
+
+
+def test_memory_store_is_bounded():
+    store = MemoryStore(max_keys=100)
+    store.take('первый', 1, 1)
+    for number in range(1000):
+        store.take(f'user:{number}', 1, 5)
+    assert len(store._buckets) == 100
+    # Дольше всех не использованная корзина удалена и снова полна.
+    assert store.take('первый', 1, 1) == 0
+
+
+def test_sqlite_store_deletes_full_buckets(tmp_path, monkeypatch):
+    store = SQLiteStore(str(tmp_path / 'rate_limits.db'))
+    clock = [1000.0]
+    monkeypatch.setattr(admission.time, 'time', lambda: clock[0])
+    store.take('старый', 1, 5)
+    assert store.take('старый', 1, 5) == 0
+    clock[0] += admission.PRUNE_INTERVAL + 10
+    store.take('новый', 1, 5)
+    keys = [row[0] for row in store._connect().execute(
+        'SELECT key FROM buckets')]
+    assert keys == ['новый']
+
+
+def test_password_hashing_rejects_overflow_at_once(monkeypatch):
+    monkeypatch.setitem(app.config, 'PASSWORD_HASHING_CONCURRENCY', 1)
+    limiter = ConcurrencyLimiter()
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        with app.app_context(), limiter.slot():
+            entered.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    entered.wait()
+    try:
+        with app.app_context(), pytest.raises(TooManyRequests):
+            with limiter.slot():
+                pass
+    finally:
+        release.set()
+        thread.join()
+    with app.app_context(), limiter.slot():
+        pass
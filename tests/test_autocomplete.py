@@ -0,0 +1,57 @@
+"""
+Тесты префиксных индексов подсказок.
+"""
+import autocomplete as autocomplete_module
+from autocomplete import Autocomplete, PrefixIndex
+
+
+def test_added_values_are_found_without_rebuild():
+    index = PrefixIndex()
+    index.extend([('ЭП2Д-0001', 2), ('ЭП2Д-0002', 0)])
+    tree = index._tree
+    index.add('ЭП2Д-0003', 1)
+    index.bump('ЭП2Д-0003')
+    assert index._tree is tree
+    assert index.pending == 1
+    assert index.search('эп2д') == ['ЭП2Д-0001', 'ЭП2Д-0003', 'ЭП2Д-0002']
+    assert index.search('эп2д', 1) == ['ЭП2Д-0001']
+    index.extend([])
+    assert index.pending == 0
+    assert index.search('эп2д-0003') == ['ЭП2Д-0003']
+
+
+def test_reload_runs_in_background(monkeypatch):
+    started = []
+    monkeypatch.setattr(autocomplete_module, 'run_in_background',
+                        started.append)
+    autocomplete = Autocomplete()
+    autocomplete.ensure_loaded(lambda: [('train', 'ЭП2Д-0001', 0)], 300)
+    autocomplete.invalidate()
+    autocomplete.ensure_loaded(lambda: [('train', 'ЭП2Д-0002', 0)], 300)
+    # Пока индексы строятся, подсказки выдаются по старым.
+    assert autocomplete.search('train', 'эп') == ['ЭП2Д-0001']
+    started.pop()()
+    assert autocomplete.search('train', 'эп') == ['ЭП2Д-0002']
+
+
+def test_values_added_during_reload_are_kept():
+    autocomplete = Autocomplete()
+
+    def loader():
+        autocomplete.add('train', 'ЭП2Д-0002')
+        yield 'train', 'ЭП2Д-0001', 0
+
+    autocomplete.ensure_loaded(loader, 300)
+    assert autocomplete.search('train', 'эп') == ['ЭП2Д-0001', 'ЭП2Д-0002']
+
+
+def test_invalidate_during_reload_requires_another():
+    autocomplete = Autocomplete()
+
+    def loader():
+        autocomplete.invalidate()
+        yield 'train', 'ЭП2Д-0001', 0
+
+    autocomplete.ensure_loaded(loader, 300)
+    assert autocomplete.search('train', 'эп') == ['ЭП2Д-0001']
+    assert autocomplete._loaded_at is None
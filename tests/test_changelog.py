@@ -0,0 +1,117 @@
+"""
+Тесты журнала изменений.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, update
+
+import changelog
+from changelog import (DELETE, INSERT, UPDATE, ChangeFeed, Change_log,
+                       latest_change, table_version)
+from controller import app
+from main import db
+from models import Defects, Train
+
+
+def add_change(change_id: int, seconds_ago: float = 0) -> None:
+    """
+    Запись в журнал с заданным номером и временем.
+    """
+    db.session.add(Change_log(
+        id=change_id, table_name='train', row_id=change_id, operation=INSERT,
+        created=datetime.now() - timedelta(seconds=seconds_ago)))
+    db.session.commit()
+
+
+def make_feed() -> tuple[ChangeFeed, list]:
+    received = []
+    feed = ChangeFeed()
+    feed.subscribe('test', received.extend, {'train'})
+    feed.start()
+    return feed, received
+
+
+def test_orm_changes_are_captured():
+    offset = latest_change()
+    train = Train(train='ЭП2Д-0003')
+    db.session.add(train)
+    db.session.commit()
+    train.location = 'Парк'
+    db.session.commit()
+    db.session.delete(train)
+    db.session.commit()
+    changes = Change_log.query.filter(
+        Change_log.id > offset).order_by(Change_log.id).all()
+    assert [(change.table_name, change.row_id, change.operation)
+            for change in changes] == [
+        ('train', train.id, INSERT), ('train', train.id, UPDATE),
+        ('train', train.id, DELETE)]
+
+
+def test_bulk_changes_are_captured():
+    offset = latest_change()
+    db.session.execute(insert(Defects), [
+        {'defect': 'Тормоза', 'subspecies_defect': 'Утечка воздуха'}])
+    db.session.execute(update(Train).values(location='Парк'))
+    db.session.execute(delete(Defects).where(Defects.defect == 'Тормоза'))
+    db.session.commit()
+    changes = Change_log.query.filter(
+        Change_log.id > offset).order_by(Change_log.id).all()
+    assert [(change.table_name, change.row_id, change.operation)
+            for change in changes] == [
+        ('defects', None, INSERT), ('train', None, UPDATE),
+        ('defects', None, DELETE)]
+
+
+def test_young_gap_waits_for_commit():
+    feed, received = make_feed()
+    offset = latest_change()
+    add_change(offset + 2)
+    feed.poll()
+    assert received == []
+    add_change(offset + 1)
+    feed.poll()
+    assert [change.id for change in received] == [offset + 1, offset + 2]
+
+
+def test_old_gap_is_rescanned():
+    feed, received = make_feed()
+    offset = latest_change()
+    # Транзакция с номером offset + 1 идет дольше GAP_TIMEOUT.
+    add_change(offset + 2, changelog.GAP_TIMEOUT + 1)
+    add_change(offset + 4, changelog.GAP_TIMEOUT + 1)
+    feed.poll()
+    assert [change.id for change in received] == [offset + 2, offset + 4]
+    add_change(offset + 3, 60)
+    feed.poll()
+    add_change(offset + 1, 60)
+    feed.poll()
+    feed.poll()
+    assert [change.id for change in received] == [
+        offset + 2, offset + 4, offset + 3, offset + 1]
+    assert feed._gaps == []
+
+
+def test_gap_is_forgotten_after_rescan_period(monkeypatch):
+    feed, received = make_feed()
+    offset = latest_change()
+    add_change(offset + 2, changelog.GAP_TIMEOUT + 1)
+    feed.poll()
+    assert len(feed._gaps) == 1
+    monkeypatch.setattr(changelog, 'GAP_RESCAN', 0)
+    add_change(offset + 1)
+    feed.poll()
+    assert [change.id for change in received] == [offset + 2]
+    assert feed._gaps == []
+
+
+def test_trim_keeps_latest_change_of_each_table():
+    db.session.execute(update(Change_log).values(
+        created=datetime.now() - timedelta(days=30)))
+    db.session.commit()
+    version = table_version('repair_information')
+    result = app.test_cli_runner().invoke(args=['changelog-trim'])
+    assert 'Удалено записей журнала' in result.output
+    assert table_version('repair_information') == version
+    assert Change_log.query.count() == len(
+        {change.table_name for change in Change_log.query})
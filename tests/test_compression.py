@@ -0,0 +1,83 @@
+"""
+Тесты сжатия ответов и политик кэширования.
+"""
+import gzip
+
+import pytest
+from flask import Response
+
+import controller
+from compression import STREAM_SIZE, compress_response
+from controller import app
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+def test_gzip(client):
+    plain = client.get('/login')
+    response = client.get('/login', headers=GZIP)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert gzip.decompress(response.data) == plain.data
+
+
+def test_brotli(client):
+    brotli = pytest.importorskip('brotli')
+    response = client.get('/registration', headers={
+        'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert 'Регистрация' in brotli.decompress(response.data).decode()
+
+
+def test_identity(client):
+    response = client.get('/', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_anonymous_page_cache(client, monkeypatch):
+    first = client.get('/', headers=GZIP)
+    monkeypatch.setattr(controller, 'render_template', None)
+    second = client.get('/', headers=GZIP)
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert second.headers['Cache-Control'] == 'public, max-age=60'
+    assert set(second.vary) >= {'Accept-Encoding', 'Cookie'}
+
+
+def test_logged_user_page_not_cached(logged_client):
+    response = logged_client.get('/', headers=GZIP)
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert 'Петров' in gzip.decompress(response.data).decode()
+    response = logged_client.get('/logout')
+    assert 'Петров' not in logged_client.get('/').text
+
+
+def test_route_policy(logged_client, fixture_ids):
+    response = logged_client.get('/autocomplete/train?q=эп')
+    assert response.headers['Cache-Control'] == 'private, max-age=60'
+    # Короткие ответы не сжимаются.
+    assert 'Content-Encoding' not in response.headers
+    response = logged_client.get('/repair_history', headers=GZIP)
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+def test_event_stream_not_compressed(logged_client):
+    response = logged_client.get('/repair_feed/ЭП2Д-0001', headers=GZIP,
+                                 buffered=False)
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Cache-Control'] == 'no-cache'
+    response.close()
+
+
+def test_large_response_streamed():
+    data = b''.join(b'%d\n' % number for number in range(STREAM_SIZE))
+    with app.test_request_context(headers=GZIP):
+        response = compress_response(
+            Response(data, mimetype='text/plain'))
+        assert response.is_streamed
+        assert 'Content-Length' not in response.headers
+        chunks = list(response.response)
+    assert len(chunks) > 2
+    assert gzip.decompress(b''.join(chunks)) == data
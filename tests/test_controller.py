@@ -0,0 +1,216 @@
+"""
+Тесты обработчиков controller.py.
+"""
+import pytest
+
+from controller import app
+from models import Repair_information, Users
+from repair_feed import broadcaster
+
+
+def test_index(client):
+    assert client.get('/').status_code == 200
+
+
+@pytest.mark.parametrize('url', [
+    '/articles', '/repair_information', '/repair_history', '/reports',
+    '/diagnostics/Цепи управления', '/admin/profile',
+    ])
+def test_login_required(client, url):
+    response = client.get(url)
+    assert response.status_code == 302
+    assert response.location.startswith('/login?next=')
+
+
+def test_content(logged_client):
+    response = logged_client.get('/articles')
+    assert response.status_code == 200
+    assert 'Контактор' in response.text
+
+
+def test_article(logged_client, fixture_ids):
+    response = logged_client.get(f"/article/{fixture_ids['article']}")
+    assert response.status_code == 200
+    assert 'Вступление' in response.text
+    assert logged_client.get('/article/0').status_code == 404
+
+
+def test_article_section(logged_client, fixture_ids):
+    url = f"/article/{fixture_ids['article']}/section/"
+    assert 'Осмотреть контакты' in logged_client.get(url + '1').text
+    assert logged_client.get(url + '3').status_code == 404
+
+
+def test_registration(client):
+    assert client.get('/registration').status_code == 200
+    response = client.post('/registration', data={
+        'name': 'Петр', 'surname': 'Иванов', 'post': 'Мастер',
+        'password': 'password', 'password2': 'password',
+        })
+    assert response.status_code == 302
+    assert response.location == '/login'
+    assert Users.query.filter_by(name='Петр').count() == 1
+
+
+def test_registration_errors(client):
+    form = {'name': 'Петр', 'surname': 'Иванов', 'post': 'Мастер',
+            'password': 'password', 'password2': 'other'}
+    assert client.post('/registration', data=form).status_code == 200
+    assert client.post('/registration',
+                       data={**form, 'post': ''}).status_code == 200
+    assert Users.query.filter_by(name='Петр').count() == 0
+
+
+def test_login(client):
+    assert client.get('/login').status_code == 200
+    form = {'name': 'Иван', 'surname': 'Петров', 'password': 'wrong'}
+    assert client.post('/login', data=form).status_code == 200
+    response = client.post('/login?next=/articles',
+                           data={**form, 'password': 'secret'})
+    assert response.location == '/articles'
+    assert client.get('/articles').status_code == 200
+
+
+def test_login_rate_limit(client):
+    form = {'name': 'Иван', 'surname': 'Петров', 'password': ''}
+    statuses = [client.post('/login', data=form).status_code
+                for _ in range(6)]
+    assert statuses == [200] * 5 + [429]
+
+
+def test_logout(logged_client):
+    assert logged_client.get('/logout').location == '/'
+    assert logged_client.get('/articles').status_code == 302
+
+
+def test_repair_information(logged_client):
+    assert logged_client.get('/repair_information').status_code == 200
+    form = {'name': 'Петр', 'surname': 'Иванов', 'train': 'ЭП2Д-0002',
+            'defect': 'Цепи управления', 's_def': 'Не горит лампа',
+            'b_inf': 'Заменена лампа', 'date': '2024-03-07'}
+    assert logged_client.post('/repair_information',
+                              data={**form, 'b_inf': ''}).status_code == 200
+    assert Repair_information.query.filter_by(
+        executer='Петр Иванов').count() == 0
+    response = logged_client.post('/repair_information', data=form)
+    assert response.status_code == 200
+    assert Repair_information.query.filter_by(
+        executer='Петр Иванов').count() == 1
+
+
+def test_repair_information_unknown_values(logged_client):
+    form = {'name': 'Петр', 'surname': 'Иванов', 'train': 'ЭП2Д-0003',
+            'defect': 'Цепи управления', 's_def': 'Не горит лампа',
+            'b_inf': 'Заменена лампа', 'date': '2024-03-07'}
+    assert 'Такого поезда нет' in logged_client.post(
+        '/repair_information', data=form).text
+    assert 'нет в каталоге' in logged_client.post(
+        '/repair_information',
+        data={**form, 'train': 'ЭП2Д-0002', 'defect': 'Цепи'}).text
+    assert Repair_information.query.filter_by(
+        executer='Петр Иванов').count() == 0
+
+
+def test_repair_information_wrong_date(logged_client):
+    form = {'name': 'Петр', 'surname': 'Иванов', 'train': 'ЭП2Д-0002',
+            'defect': 'Цепи управления', 's_def': 'Не горит лампа',
+            'b_inf': 'Заменена лампа', 'date': '07.03.2024'}
+    response = logged_client.post('/repair_information', data=form)
+    assert response.status_code == 200
+    assert 'Неверная дата' in response.text
+    assert Repair_information.query.filter_by(
+        executer='Петр Иванов').count() == 0
+
+
+def test_autocomplete_field(logged_client):
+    response = logged_client.get('/autocomplete/defect?q=цеп')
+    assert response.json == ['Цепи управления']
+    assert logged_client.get('/autocomplete/post').status_code == 404
+
+
+def test_repair_history(logged_client):
+    response = logged_client.get('/repair_history')
+    assert 'ЭП2Д-0002' in response.text
+
+
+def test_repair_history_continion(logged_client):
+    form = {'train': 'ЭП2Д-0001', 'start_date': '', 'end_date': ''}
+    response = logged_client.post('/repair_history_continion', data=form)
+    assert response.text.count('-03-2024') == 3
+    response = logged_client.post('/repair_history_continion', data={
+        **form, 'start_date': '2024-03-02', 'end_date': '2024-03-31'})
+    assert response.text.count('-03-2024') == 2
+    assert '01-03-2024' not in response.text
+    response = logged_client.post('/repair_history_continion', data={
+        **form, 'start_date': '2024-03-02', 'end_date': '31.03.2024'})
+    assert response.status_code == 200
+    assert 'Неверная дата' in response.text
+
+
+def test_repair_feed(logged_client):
+    broadcaster.publish('ЭП2Д-0001', {'id': 1})
+    event_id = broadcaster._last_id
+    response = logged_client.get(
+        '/repair_feed/ЭП2Д-0001',
+        headers={'Last-Event-ID': str(event_id - 1)},
+        buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    stream = iter(response.response)
+    assert next(stream).decode() == (
+        f'id: {event_id}\nevent: repair\ndata: {{"id": 1}}\n\n')
+    assert next(stream) == b'retry: 3000\n\n'
+    response.close()
+
+
+def test_repair_feed_subscribers_limit(logged_client, monkeypatch):
+    monkeypatch.setitem(app.config, 'REPAIR_FEED_MAX_SUBSCRIBERS', 1)
+    url = '/repair_feed/ЭП2Д-0001'
+    response = logged_client.get(url, buffered=False)
+    assert response.status_code == 200
+    assert logged_client.get(url, buffered=False).status_code == 503
+    response.close()
+    response = logged_client.get(url, buffered=False)
+    assert response.status_code == 200
+    response.close()
+
+
+def test_reports(logged_client):
+    assert logged_client.get('/reports').status_code == 200
+    assert logged_client.post('/reports', data={
+        'month': '', 'format': 'csv'}).status_code == 200
+    form = {'month': '2024-03', 'format': 'csv'}
+    response = logged_client.post('/reports', data=form)
+    url = response.location
+    assert logged_client.get(url).status_code == 200
+    assert logged_client.get(url + '/status').json == {
+        'status': 'done', 'error': None}
+    report = logged_client.get(url + '/download')
+    assert report.mimetype == 'text/csv'
+    assert 'ЭП2Д-0001,Цепи управления,Не включается контактор,3' in (
+        report.text)
+    assert logged_client.post('/reports', data=form).location == url
+
+
+def test_report_not_found(logged_client):
+    assert logged_client.get('/reports/0').status_code == 404
+    assert logged_client.get('/reports/0/status').status_code == 404
+    assert logged_client.get('/reports/0/download').status_code == 404
+
+
+def test_diagnostics(logged_client):
+    response = logged_client.get('/diagnostics/Цепи управления')
+    assert 'Не горит лампа' in response.text
+
+
+def test_diagnostics_sub_defect(logged_client, fixture_ids):
+    response = logged_client.get(f"/sub_defect/{fixture_ids['defect']}")
+    assert 'Заменить контактор' in response.text
+
+
+def test_profile(logged_client, fixture_ids, monkeypatch):
+    assert logged_client.get('/admin/profile').status_code == 403
+    monkeypatch.setitem(app.config, 'ADMIN_USERS', [str(fixture_ids['user'])])
+    assert logged_client.get('/admin/profile').mimetype == 'text/plain'
+    response = logged_client.get('/admin/profile?format=speedscope')
+    assert response.json['profiles'] == []
+    assert logged_client.post('/admin/profile').status_code == 204
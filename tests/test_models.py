@@ -0,0 +1,153 @@
+"""
+Тесты методов DataAccess.
+"""
+from datetime import date
+
+from flask_login import current_user
+
+import models
+from autocomplete import autocomplete
+from changelog import change_feed
+from controller import app
+from main import db
+from models import DataAccess, Repair_information, Train, Users
+
+dataAccess = DataAccess()
+
+
+def test_get_articles(fixture_ids):
+    articles = dataAccess.get_articles()
+    assert [article.title for article in articles] == ['Контактор']
+
+
+def test_get_article(fixture_ids):
+    article = dataAccess.get_article(fixture_ids['article'])
+    assert article.sections_count == 3
+    assert 'Осмотр' in article.toc
+    assert dataAccess.get_article(0) is None
+
+
+def test_get_article_section(fixture_ids):
+    section = dataAccess.get_article_section(fixture_ids['article'], 2)
+    assert 'Заменить контактор' in section.html
+    assert dataAccess.get_article_section(fixture_ids['article'], 3) is None
+
+
+def test_get_report_job():
+    assert dataAccess.get_report_job(1) is None
+
+
+def test_add_user():
+    dataAccess.add_user('Петр', 'Иванов', 'password', 'Мастер')
+    user = Users.query.filter_by(name='Петр').one()
+    assert user.surname == 'Иванов'
+    assert user.password != 'password'
+
+
+def test_get_user():
+    with app.test_request_context():
+        assert dataAccess.get_user('Иван', 'Петров', 'wrong') is None
+        assert not current_user.is_authenticated
+        assert dataAccess.get_user('Иван', 'Петров', 'secret') is True
+        assert current_user.name == 'Иван'
+
+
+def test_get_trains():
+    trains = dataAccess.get_trains()
+    assert [train.train for train in trains] == ['ЭП2Д-0001', 'ЭП2Д-0002']
+
+
+def test_train_exists():
+    assert dataAccess.train_exists('ЭП2Д-0001') is True
+    assert dataAccess.train_exists('ЭП2Д-0003') is False
+
+
+def test_defect_exists():
+    assert dataAccess.defect_exists('Цепи управления') is True
+    assert dataAccess.defect_exists('Не горит лампа') is False
+
+
+def test_add_repair_inf():
+    with app.test_request_context():
+        dataAccess.add_repair_inf('Петр', 'Иванов', 'ЭП2Д-0002',
+                                  'Цепи управления', 'Не горит лампа',
+                                  'Заменена лампа', date(2024, 3, 7))
+    repair = Repair_information.query.filter_by(executer='Петр Иванов').one()
+    assert repair.train == 'ЭП2Д-0002'
+    assert repair.date == date(2024, 3, 7)
+
+
+def test_add_repair_inf_updates_index_while_feed_busy(monkeypatch):
+    monkeypatch.setitem(app.config, 'REPAIR_DATE_INDEX', True)
+    period = ('ЭП2Д-0002', date(2024, 3, 1), date(2024, 3, 31))
+    assert len(dataAccess.get_repair_inf_with_date(*period)) == 1
+    change_feed.poll()
+    # Журнал в это время читает другой поток.
+    with change_feed._lock, app.test_request_context():
+        dataAccess.add_repair_inf('Петр', 'Иванов', 'ЭП2Д-0002',
+                                  'Цепи управления', 'Не горит лампа',
+                                  'Заменена лампа', date(2024, 3, 7))
+    assert len(dataAccess.get_repair_inf_with_date(*period)) == 2
+    change_feed.poll()
+    assert models._indexed_repairs == set()
+    assert len(dataAccess.get_repair_inf_with_date(*period)) == 2
+
+
+def test_add_repair_inf_is_rolled_back():
+    assert Repair_information.query.filter_by(
+        executer='Петр Иванов').first() is None
+
+
+def test_get_suggestions():
+    assert dataAccess.get_suggestions('train', 'эп2д') == [
+        'ЭП2Д-0001', 'ЭП2Д-0002']
+    assert dataAccess.get_suggestions('s_def', 'лампа') == ['Не горит лампа']
+    assert dataAccess.get_suggestions('executer', '') == []
+
+
+def test_suggestions_follow_catalog_changes(monkeypatch):
+    assert dataAccess.get_suggestions('train', 'эп2д-0003') == []
+    change_feed.poll()
+    monkeypatch.setattr(DataAccess, '_suggestion_values', None)
+    train = Train(train='ЭП2Д-0003', location='Депо')
+    db.session.add(train)
+    db.session.commit()
+    change_feed.poll()
+    # Новый поезд добавлен в индекс без его перестроения.
+    assert dataAccess.get_suggestions('train', 'эп2д-0003') == ['ЭП2Д-0003']
+    train.location = 'Парк'
+    db.session.commit()
+    change_feed.poll()
+    assert autocomplete._loaded_at is None
+
+
+def test_get_repair_inf_with_date():
+    repair_inf = dataAccess.get_repair_inf_with_date(
+        'ЭП2Д-0001', date(2024, 3, 1), date(2024, 3, 10))
+    assert sorted(repair.date.day for repair in repair_inf) == [1, 5]
+
+
+def test_get_repair_inf_with_date_index(monkeypatch):
+    monkeypatch.setitem(app.config, 'REPAIR_DATE_INDEX', True)
+    repair_inf = dataAccess.get_repair_inf_with_date(
+        'ЭП2Д-0001', date(2024, 3, 1), date(2024, 3, 10))
+    assert [repair.date.day for repair in repair_inf] == [1, 5]
+    assert dataAccess.get_repair_inf_with_date(
+        'ЭП2Д-0003', date(2024, 3, 1), date(2024, 3, 10)) == []
+
+
+def test_get_repair_inf():
+    assert len(dataAccess.get_repair_inf('ЭП2Д-0001')) == 3
+    assert dataAccess.get_repair_inf('ЭП2Д-0003') == []
+
+
+def test_get_all_sub_defets():
+    all_sub_defect = dataAccess.get_all_sub_defets('Цепи управления')
+    assert {sub.subspecies_defect for sub in all_sub_defect} == {
+        'Не включается контактор', 'Не горит лампа'}
+
+
+def test_get_sub_defet(fixture_ids):
+    sub_defect = dataAccess.get_sub_defet(fixture_ids['defect'])
+    assert sub_defect.repair == 'Заменить контактор'
+    assert dataAccess.get_sub_defet(0) is None
@@ -0,0 +1,15 @@
+"""
+Тесты ленты записей о ремонте.
+"""
+import repair_feed
+from repair_feed import SQLiteEventStore
+
+
+def test_store_keeps_last_events(tmp_path, monkeypatch):
+    monkeypatch.setattr(repair_feed, 'BUFFER_SIZE', 3)
+    store = SQLiteEventStore(str(tmp_path / 'repair_events.db'))
+    for number in range(5):
+        store.append('ЭП2Д-0001', str(number))
+    assert store.since(0) == [(3, 'ЭП2Д-0001', '2'), (4, 'ЭП2Д-0001', '3'),
+                              (5, 'ЭП2Д-0001', '4')]
+    assert store.last_id() == 5
@@ -0,0 +1,46 @@
+"""
+Тесты индекса дат ремонтов.
+"""
+from datetime import date
+
+from repair_index import RepairIndex
+
+PERIOD = ('ЭП2Д-0001', date(2024, 3, 1), date(2024, 3, 31))
+
+
+def test_add_during_first_build():
+    index = RepairIndex()
+
+    def loader():
+        index.add('ЭП2Д-0001', date(2024, 3, 7), 2)
+        yield 'ЭП2Д-0001', date(2024, 3, 1), 1
+
+    index.ensure_loaded(loader, 300)
+    assert index.range_ids(*PERIOD) == [1, 2]
+
+
+def test_add_during_rebuild():
+    index = RepairIndex()
+    index.ensure_loaded(lambda: [('ЭП2Д-0001', date(2024, 3, 1), 1)], 300)
+
+    def loader():
+        index.add('ЭП2Д-0001', date(2024, 3, 7), 2)
+        # Запись 2 зафиксирована после чтения загрузчика.
+        yield 'ЭП2Д-0001', date(2024, 3, 1), 1
+
+    index.ensure_loaded(loader, 0)
+    assert index.range_ids(*PERIOD) == [1, 2]
+    index.add('ЭП2Д-0001', date(2024, 3, 7), 2)
+    assert index.range_ids(*PERIOD) == [1, 2]
+
+
+def test_invalidate_during_build():
+    index = RepairIndex()
+
+    def loader():
+        index.invalidate()
+        return [('ЭП2Д-0001', date(2024, 3, 1), 1)]
+
+    index.ensure_loaded(loader, 300)
+    assert index.range_ids(*PERIOD) == [1]
+    assert index._loaded_at is None
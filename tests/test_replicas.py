@@ -0,0 +1,93 @@
+"""
+Тесты распределения запросов между основной базой и репликой.
+Основная база и реплика - два файла SQLite с разными поездами,
+их движки подставляются вместо заданных в конфиге.
+"""
+from contextlib import contextmanager
+
+import pytest
+import sqlalchemy as sa
+from flask import session
+
+from controller import app
+from main import db
+from models import Train
+
+
+def create_database(path) -> sa.Engine:
+    engine = sa.create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """
+    Основная база с поездом ЭП2Д-0001 и реплика с поездом ЭП2Д-0002.
+    """
+    primary = create_database(tmp_path / 'primary.db')
+    replica = create_database(tmp_path / 'replica.db')
+    for engine, train in ((primary, 'ЭП2Д-0001'), (replica, 'ЭП2Д-0002')):
+        with engine.begin() as connection:
+            connection.execute(sa.insert(Train).values(
+                train=train, location='Депо'))
+    db.session.remove()
+    monkeypatch.setitem(db.engines, None, primary)
+    monkeypatch.setitem(db.engines, 'replica_0', replica)
+    monkeypatch.setitem(app.config, 'REPLICA_HEALTH_INTERVAL', 0)
+    yield replica
+    db.session.remove()
+    primary.dispose()
+    replica.dispose()
+
+
+@contextmanager
+def user_request():
+    """
+    Контекст запроса со своим контекстом приложения, как у запроса
+    к серверу: иначе g общий с контекстом теста.
+    """
+    with app.app_context(), app.test_request_context():
+        yield
+
+
+def trains() -> list:
+    return db.session.scalars(
+        sa.select(Train.train).order_by(Train.train)).all()
+
+
+def test_read_from_replica(replica):
+    with user_request():
+        assert trains() == ['ЭП2Д-0002']
+
+
+def test_read_after_write_in_request(replica):
+    with user_request():
+        db.session.add(Train(train='ЭП2Д-0003', location='Депо'))
+        db.session.commit()
+        assert trains() == ['ЭП2Д-0001', 'ЭП2Д-0003']
+
+
+def test_read_after_write_within_lag(replica, monkeypatch):
+    with user_request():
+        db.session.add(Train(train='ЭП2Д-0003', location='Депо'))
+        db.session.commit()
+        last_write = session['db_last_write']
+    with user_request():
+        session['db_last_write'] = last_write
+        assert trains() == ['ЭП2Д-0001', 'ЭП2Д-0003']
+    monkeypatch.setitem(app.config, 'REPLICA_MAX_LAG', 0)
+    with user_request():
+        session['db_last_write'] = last_write
+        assert trains() == ['ЭП2Д-0002']
+
+
+def test_unhealthy_replica(replica, tmp_path, monkeypatch):
+    monkeypatch.setitem(db.engines, 'replica_0', sa.create_engine(
+        f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"))
+    with user_request():
+        assert trains() == ['ЭП2Д-0001']
+
+
+def test_read_outside_request(replica):
+    assert trains() == ['ЭП2Д-0001']
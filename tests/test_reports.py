@@ -0,0 +1,125 @@
+"""
+Тесты фонового построения отчетов.
+"""
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+import reports
+from controller import app
+from models import Report_jobs
+from tests.conftest import InlineExecutor
+
+PARAMS = {'month': '2024-03', 'format': 'csv'}
+
+
+class BrokenExecutor:
+    """
+    Пул, процесс которого погиб.
+    """
+
+    def submit(self, function, *args):
+        raise BrokenProcessPool('процесс пула завершился')
+
+
+def test_run_missing_job():
+    reports.run_report_job(0)
+
+
+def test_broken_pool_is_replaced(monkeypatch):
+    executors = [BrokenExecutor(), InlineExecutor()]
+    replaced = []
+    monkeypatch.setattr(reports, 'get_executor', lambda: executors[0])
+    monkeypatch.setattr(reports, 'reset_executor',
+                        lambda executor: replaced.append(executors.pop(0)))
+    job = reports.submit_report('monthly_depot', PARAMS)
+    assert len(replaced) == 1
+    reports.db.session.expire_all()
+    assert reports.db.session.get(Report_jobs, job.id).status == reports.DONE
+
+
+def test_broken_pool_fails_job(monkeypatch):
+    monkeypatch.setattr(reports, 'get_executor', BrokenExecutor)
+    job = reports.submit_report('monthly_depot', PARAMS)
+    reports.db.session.expire_all()
+    job = reports.db.session.get(Report_jobs, job.id)
+    assert job.status == reports.FAILED
+    # Ошибочное задание не используется повторно.
+    monkeypatch.setattr(reports, 'get_executor', InlineExecutor)
+    assert reports.submit_report('monthly_depot', PARAMS).id != job.id
+
+
+def test_dead_worker_fails_job(monkeypatch):
+    job = reports.submit_report('monthly_depot', PARAMS)
+    job.status = reports.RUNNING
+    reports.db.session.commit()
+    replaced = []
+    monkeypatch.setattr(reports, 'reset_executor', replaced.append)
+    future = Future()
+    future.set_exception(BrokenProcessPool('процесс пула завершился'))
+    reports.check_report_job(job.id, future, 'пул')
+    reports.db.session.expire_all()
+    job = reports.db.session.get(Report_jobs, job.id)
+    assert job.status == reports.FAILED
+    assert 'BrokenProcessPool' in job.error
+    assert replaced == ['пул']
+
+
+def add_job(status: str, seconds_ago: float = 0) -> Report_jobs:
+    moment = datetime.now() - timedelta(seconds=seconds_ago)
+    job = Report_jobs(kind='monthly_depot', status=status, created=moment,
+                      started=moment if status == reports.RUNNING else None,
+                      params='{"format": "csv", "month": "2024-03"}',
+                      content_type=reports.FORMATS['csv'])
+    reports.db.session.add(job)
+    reports.db.session.commit()
+    return job
+
+
+def test_running_reports_are_limited(monkeypatch):
+    monkeypatch.setitem(app.config, 'REPORT_WORKERS', 1)
+    running = add_job(reports.RUNNING).id
+    queued = add_job(reports.QUEUED)
+    waits = []
+
+    def sleep(seconds):
+        # Отчет другого воркера достроился.
+        waits.append(seconds)
+        reports.db.session.execute(
+            update(Report_jobs).where(Report_jobs.id == running)
+            .values(status=reports.DONE))
+        reports.db.session.commit()
+
+    monkeypatch.setattr(reports.time, 'sleep', sleep)
+    reports.run_report_job(queued.id)
+    assert waits == [reports.CLAIM_INTERVAL]
+    reports.db.session.expire_all()
+    assert reports.db.session.get(Report_jobs, queued.id).status == (
+        reports.DONE)
+
+
+def test_lost_running_job_does_not_take_place(monkeypatch):
+    monkeypatch.setitem(app.config, 'REPORT_WORKERS', 1)
+    add_job(reports.RUNNING, app.config['REPORT_JOB_TIMEOUT'] + 1)
+    job = add_job(reports.QUEUED)
+    assert reports.claim_report_job(job.id) is True
+    assert reports.claim_report_job(job.id) is False
+
+
+def test_stale_jobs_fail(logged_client):
+    timeout = app.config['REPORT_JOB_TIMEOUT']
+    queued = add_job(reports.QUEUED, timeout + 1)
+    running = add_job(reports.RUNNING, timeout + 1)
+    fresh = add_job(reports.QUEUED)
+    assert logged_client.get(f'/reports/{queued.id}/status').json[
+        'status'] == reports.FAILED
+    reports.db.session.expire_all()
+    assert reports.db.session.get(Report_jobs, running.id).status == (
+        reports.FAILED)
+    assert reports.db.session.get(Report_jobs, fresh.id).status == (
+        reports.QUEUED)
+    # Повторный заказ ставит новое задание вместо потерянного.
+    job = reports.submit_report('monthly_depot', PARAMS)
+    assert job.id not in (queued.id, running.id)